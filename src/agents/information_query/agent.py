@@ -18,6 +18,33 @@ from langchain_mcp_adapters.client import MultiServerMCPClient
 from llm.llm_model import ainvoke_with_tools, ainvoke
 from pydantic_core import ArgsKwargs
 from common.dataset import Dataset
+from common.ttl_cache import TTLCache
+
+# MCP tools of the financial_data server by url and token. Listing them costs a session setup and handshake,
+# the returned tools keep only the connection config and open their own session per call, so they can be reused
+_mcp_tools_cache = TTLCache(maxsize=32, ttl=5 * 60)
+
+
+async def get_mcp_tools(dataset_client: Dataset) -> list:
+    """Tools of the financial_data MCP, listed at most once per cache ttl for each dataset account."""
+    cache_key = (dataset_client.remote_dataset_url, dataset_client.remote_dataset_token)
+    tools = _mcp_tools_cache.get(cache_key)
+    if tools is None:
+        client = MultiServerMCPClient(
+            {
+                "financial_data": {
+                    # Ensure you start your financial data server on port 8000
+                    "url": f"{dataset_client.remote_dataset_url}/mcp",
+                    "headers": {
+                        "Authorization":f"Bearer {dataset_client.remote_dataset_token}"
+                    },
+                    "transport": "streamable_http",
+                }
+            }
+        )
+        tools = await client.get_tools()
+        _mcp_tools_cache.set(cache_key, tools)
+    return list(tools)
 
 
 async def query(state: AgentState, config: RunnableConfig) -> Dict[str, Any]:
@@ -57,21 +84,8 @@ async def call_mcp(state: AgentState, config: RunnableConfig) -> Dict[str, Any]:
     """
     try:
         dataset_client = Dataset(config)
-        client = MultiServerMCPClient(
-            {
-                "financial_data": {
-                    # Ensure you start your financial data server on port 8000
-                    "url": f"{dataset_client.remote_dataset_url}/mcp",
-                    "headers": {
-                        "Authorization":f"Bearer {dataset_client.remote_dataset_token}"
-                    },
-                    "transport": "streamable_http",
-                }
-            }
-        )
-
         # Get tools from the financial_data MCP
-        tools = await client.get_tools()
+        tools = await get_mcp_tools(dataset_client)
         
         # Get the latest message content
         last_content = get_latest_message_content(state)
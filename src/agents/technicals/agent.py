@@ -22,6 +22,7 @@ from agents.technicals.mean_reversion_analysis import MeanReversionAnalysis
 from agents.technicals.momentum_analysis import MomentumAnalysis
 from agents.technicals.volatility_analysis import VolatilityAnalysis
 from agents.technicals.statistical_arbitrage_analysis import StatisticalArbitrageAnalysis
+from agents.technicals.technicals_bundle import TechnicalsBundle
 
 from nodes.next_step_suggestions import NextStepSuggestions
 
@@ -29,6 +30,7 @@ from nodes.ticker_search import TickerSearch
 from typing_extensions import Literal
 from common import markdown
 from common.dataset import Dataset
+from common.price_arrays import clean_prices
 
 next_step_suggestions_node = NextStepSuggestions({})
 trend_analysis_node = TrendAnalysis({})
@@ -36,6 +38,14 @@ mean_reversion_analysis_node = MeanReversionAnalysis({})
 momentum_analysis_node = MomentumAnalysis({})
 volatility_analysis_node = VolatilityAnalysis({})
 statistical_arbitrage_analysis_node = StatisticalArbitrageAnalysis({})
+# every technical analysis runs in one node, in this order, sharing the price arrays
+technicals_bundle_node = TechnicalsBundle({'analyzers': [
+    trend_analysis_node,
+    mean_reversion_analysis_node,
+    momentum_analysis_node,
+    volatility_analysis_node,
+    statistical_arbitrage_analysis_node,
+]})
 
 async def start_analysis(state: AgentState, config: RunnableConfig):
     
@@ -52,7 +62,7 @@ async def start_analysis(state: AgentState, config: RunnableConfig):
     start_date = time.strftime("%Y-%m-%d", time.localtime(time.time() - 365*24*60*60))  # 1 year of data
     prices = dataset_client.get_prices(ticker.get('symbol'), start_date, end_date)
     
-    context['prices'] = prices
+    context['prices'] = clean_prices(prices)
     return {
         'context': context,
         'messages':[AIMessage(content=markdown.to_h2('Technical Analysis for '+ ticker.get('symbol')))]
@@ -163,20 +173,12 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
 workflow = StateGraph(AgentState)
 workflow.add_node("start_analysis", start_analysis)
 
-workflow.add_node("trend_analysis", trend_analysis_node)
-workflow.add_node("mean_reversion_analysis", mean_reversion_analysis_node)
-workflow.add_node("momentum_analysis", momentum_analysis_node)
-workflow.add_node("volatility_analysis", volatility_analysis_node)
-workflow.add_node("statistical_arbitrage_analysis", statistical_arbitrage_analysis_node)
+workflow.add_node("technicals_bundle", technicals_bundle_node)
 
 workflow.add_node("end_analysis", end_analysis)
 
-workflow.add_edge("start_analysis", "trend_analysis")
-workflow.add_edge("trend_analysis", "mean_reversion_analysis")
-workflow.add_edge("mean_reversion_analysis", "momentum_analysis")
-workflow.add_edge("momentum_analysis", "volatility_analysis")
-workflow.add_edge("volatility_analysis", "statistical_arbitrage_analysis")
-workflow.add_edge("statistical_arbitrage_analysis", "end_analysis")
+workflow.add_edge("start_analysis", "technicals_bundle")
+workflow.add_edge("technicals_bundle", "end_analysis")
 
 workflow.set_entry_point("start_analysis")
 workflow.set_finish_point("end_analysis")
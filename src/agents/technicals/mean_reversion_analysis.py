@@ -7,6 +7,9 @@ import time
 from common import markdown
 from langgraph.types import StreamWriter
 import math
+from operator import itemgetter
+
+_get_close = itemgetter('close')
 
 
 class MeanReversionAnalysis():
@@ -19,7 +22,7 @@ class MeanReversionAnalysis():
         if len(prices) < period:
             return 0
         
-        closes = [price.get('close', 0) for price in prices[-period:] if price.get('close')]
+        closes = list(map(_get_close, prices[-period:]))
         if len(closes) < period:
             return 0
             
@@ -30,7 +33,7 @@ class MeanReversionAnalysis():
         if len(prices) < period:
             return 0
         
-        closes = [price.get('close', 0) for price in prices[-period:] if price.get('close')]
+        closes = list(map(_get_close, prices[-period:]))
         if len(closes) < period:
             return 0
             
@@ -43,7 +46,7 @@ class MeanReversionAnalysis():
         if len(prices) < period + 1:
             return 50  # Neutral RSI
         
-        closes = [price.get('close', 0) for price in prices[-(period+1):] if price.get('close')]
+        closes = list(map(_get_close, prices[-(period+1):]))
         if len(closes) < period + 1:
             return 50
         
@@ -87,7 +90,7 @@ class MeanReversionAnalysis():
         bb_lower = ma_50 - (2 * std_50)
         
         # Calculate z-score of price relative to moving average
-        current_price = prices[-1].get('close', 0) if prices else 0
+        current_price = prices[-1]['close'] if prices else 0
         z_score = (current_price - ma_50) / std_50 if std_50 > 0 else 0
         
         # Calculate price position within Bollinger Bands
@@ -150,6 +153,13 @@ class MeanReversionAnalysis():
         result["details"] = reasoning
         return result
 
+    def run(self, context: dict, price_arrays: dict = None) -> dict[str, any]:
+        """Analyze context['prices'] and return the result tagged with its type and title. It reads the rows, price_arrays is unused."""
+        analysis = self.analyze(context.get('prices'))
+        analysis['type'] = 'mean_reversion_analysis'
+        analysis['title'] = f'Mean Reversion Analysis'
+        return analysis
+
     def get_markdown(self, analysis:dict):
         """
         Convert analysis to markdown.
@@ -163,10 +173,7 @@ class MeanReversionAnalysis():
         if analysis_data is None:
             analysis_data = {}
             context['analysis_data'] = analysis_data
-        prices = context.get('prices')
-        analysis = self.analyze(prices)
-        analysis['type'] = 'mean_reversion_analysis'
-        analysis['title'] = f'Mean Reversion Analysis'
+        analysis = self.run(context)
 
         analysis_data['mean_reversion_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
@@ -7,6 +7,9 @@ import time
 from common import markdown
 from langgraph.types import StreamWriter
 import math
+from operator import itemgetter
+
+_get_close = itemgetter('close')
 
 
 class MomentumAnalysis():
@@ -19,10 +22,11 @@ class MomentumAnalysis():
         if len(prices) < 2:
             return []
         
+        closes = list(map(_get_close, prices))
         returns = []
-        for i in range(1, len(prices)):
-            prev_close = prices[i-1].get('close', 0)
-            curr_close = prices[i].get('close', 0)
+        for i in range(1, len(closes)):
+            prev_close = closes[i-1]
+            curr_close = closes[i]
             if prev_close > 0:
                 ret = (curr_close - prev_close) / prev_close * 100
                 returns.append(ret)
@@ -137,6 +141,13 @@ class MomentumAnalysis():
         result["details"] = reasoning
         return result
 
+    def run(self, context: dict, price_arrays: dict = None) -> dict[str, any]:
+        """Analyze context['prices'] and return the result tagged with its type and title. It reads the rows, price_arrays is unused."""
+        analysis = self.analyze(context.get('prices'))
+        analysis['type'] = 'momentum_analysis'
+        analysis['title'] = f'Momentum Analysis'
+        return analysis
+
     def get_markdown(self, analysis:dict):
         """
         Convert analysis to markdown.
@@ -150,10 +161,7 @@ class MomentumAnalysis():
         if analysis_data is None:
             analysis_data = {}
             context['analysis_data'] = analysis_data
-        prices = context.get('prices')
-        analysis = self.analyze(prices)
-        analysis['type'] = 'momentum_analysis'
-        analysis['title'] = f'Momentum Analysis'
+        analysis = self.run(context)
 
         analysis_data['momentum_analysis'] = analysis
         ai_message = AIMessage(content=self.get_markdown(analysis))
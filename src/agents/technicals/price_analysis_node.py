@@ -0,0 +1,69 @@
+from common.agent_state import AgentState
+from langchain.schema import AIMessage
+from langchain_core.runnables import RunnableConfig
+from typing import Dict, Any
+from common import markdown
+from common.price_arrays import to_price_arrays
+from langgraph.types import StreamWriter
+import numpy as np
+
+
+class PriceAnalysisNode():
+    """
+    Shared node flow of the technical analyzers that work on price column arrays. Subclasses set analysis_type,
+    analysis_title and MIN_LEN and implement analyze(price_arrays). The arrays are never stored in the context,
+    run() takes them from its caller or builds them from context['prices'].
+    """
+    analysis_type: str = None
+    analysis_title: str = None
+    MIN_LEN: int = 0
+
+    def __init__(self, options: Dict[str, Any]):
+        self.options = options
+
+    def insufficient_data_analysis(self) -> dict[str, any]:
+        """Result returned when there are fewer than MIN_LEN prices."""
+        return {
+            "score": 0,
+            "max_score": 10,
+            "details": [f'Insufficient price data for {self.analysis_title.lower()} (need at least {self.MIN_LEN} days)'],
+            "indicators": {}
+        }
+
+    def run(self, context: dict, price_arrays: dict[str, np.ndarray] = None) -> dict[str, any]:
+        """
+        Analyze context['prices'] and return the result tagged with its type and title.
+        price_arrays are the column arrays of those prices when the caller already built them.
+        """
+        prices = context.get('prices')
+        if not prices or len(prices) < self.MIN_LEN:
+            analysis = self.insufficient_data_analysis()
+        else:
+            analysis = self.analyze(price_arrays if price_arrays is not None else to_price_arrays(prices))
+        analysis['type'] = self.analysis_type
+        analysis['title'] = self.analysis_title
+        return analysis
+
+    def get_markdown(self, analysis:dict):
+        """
+        Convert analysis to markdown.
+        """
+        markdown_content = markdown.analysis_data(analysis)
+        return markdown_content
+
+    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        context = state.get('context')
+        analysis_data = context.get('analysis_data')
+        if analysis_data is None:
+            analysis_data = {}
+            context['analysis_data'] = analysis_data
+        analysis = self.run(context)
+
+        analysis_data[self.analysis_type] = analysis
+        ai_message = AIMessage(content=self.get_markdown(analysis))
+        return {
+            "context": context,
+            "messages": [
+                ai_message
+            ]
+        }
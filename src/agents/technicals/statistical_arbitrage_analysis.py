@@ -1,77 +1,101 @@
-from common.agent_state import AgentState
-from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
-from langchain_core.runnables import RunnableConfig
 from typing import Dict, Any
 import time
-from common import markdown
-from langgraph.types import StreamWriter
+from agents.technicals.price_analysis_node import PriceAnalysisNode
 import math
+import numpy as np
 
 
-class StatisticalArbitrageAnalysis():
-    def __init__(self, options: Dict[str, Any]):
-        self.options = options
+# Scoring tables. Buckets come from np.searchsorted(..., side='right'); np.nextafter turns a
+# threshold into a strict "greater than" boundary so the tables match the original comparisons.
+# Hurst buckets: < 0.3, < 0.4, < 0.45, <= 0.55, > 0.55
+_HURST_BUCKETS = np.array([0.3, 0.4, 0.45, np.nextafter(0.55, np.inf)])
+# Skewness buckets: < -2, < -1, [-1, 1], > 1, > 2
+_SKEW_BUCKETS = np.array([-2, -1, np.nextafter(1, np.inf), np.nextafter(2, np.inf)])
+# Kurtosis buckets: < 2, [2, 6], > 6
+_KURTOSIS_BUCKETS = np.array([2, np.nextafter(6, np.inf)])
+
+_STRONG_BULLISH_REVERSION = (2, "Strong mean reversion signal (Hurst: {hurst:.3f}, Skewness: {skew:.2f})")
+_STRONG_BEARISH_REVERSION = (-2, "Strong mean reversion signal (Hurst: {hurst:.3f}, Skewness: {skew:.2f})")
+_REVERSION_TENDENCY = (1, "Mean reversion tendency (Hurst: {hurst:.3f})")
+_RANDOM_WALK = (0, "Random walk characteristics (Hurst: {hurst:.3f})")
+_TRENDING_TENDENCY = (-1, "Trending tendency (Hurst: {hurst:.3f})")
+
+# (delta, reason) indexed by [hurst bucket][skew bucket]
+_HURST_SIGNALS = (
+    (_STRONG_BEARISH_REVERSION, _STRONG_BEARISH_REVERSION, _REVERSION_TENDENCY, _STRONG_BULLISH_REVERSION, _STRONG_BULLISH_REVERSION),
+    (_STRONG_BEARISH_REVERSION, _STRONG_BEARISH_REVERSION, _REVERSION_TENDENCY, _STRONG_BULLISH_REVERSION, _STRONG_BULLISH_REVERSION),
+    (_REVERSION_TENDENCY,) * 5,
+    (_RANDOM_WALK,) * 5,
+    (_TRENDING_TENDENCY,) * 5,
+)
+# (delta, reason) indexed by skew bucket, None when the bucket does not move the score
+_SKEW_SIGNALS = (
+    (-1, "Negative return skewness ({skew:.2f}) - unfavorable for long positions"),
+    None,
+    None,
+    None,
+    (1, "Positive return skewness ({skew:.2f}) - favorable for long positions"),
+)
+# (delta, reason) indexed by kurtosis bucket
+_KURTOSIS_SIGNALS = (
+    (0.5, "Low kurtosis ({kurt:.2f}) - more predictable returns"),
+    None,
+    (-0.5, "High kurtosis ({kurt:.2f}) - increased tail risk"),
+)
+# (delta, reason) keyed by (hurst bucket, skew bucket): Hurst < 0.3 with |skew| > 2
+_SETUP_SIGNALS = {
+    (0, 0): (-0.5, "Very strong statistical arbitrage setup - mean reversion with negative skew"),
+    (0, 4): (0.5, "Very strong statistical arbitrage setup - mean reversion with positive skew"),
+}
+
+
+def _skew_kurt(data: np.ndarray) -> tuple[float, float]:
+    """Sample skewness and kurtosis of a contiguous float64 array, sharing one mean/std pass"""
+    n = len(data)
+    if n < 3:
+        return 0.0, 3.0
+    deviations = data - data.mean()
+    std = math.sqrt(float(np.dot(deviations, deviations)) / (n - 1))
+    if std == 0:
+        return 0.0, 3.0
+    z = deviations / std
+    z2 = z * z
+    skew = float(np.dot(z2, z)) * n / ((n - 1) * (n - 2))
+    if n < 4:
+        return skew, 3.0
+    kurt = float(np.dot(z2, z2)) * n * (n + 1) / ((n - 1) * (n - 2) * (n - 3)) - 3 * (n - 1) ** 2 / ((n - 2) * (n - 3))
+    return skew, kurt
+
+
+class StatisticalArbitrageAnalysis(PriceAnalysisNode):
+    analysis_type = 'statistical_arbitrage_analysis'
+    analysis_title = 'Statistical Arbitrage Analysis'
+    MIN_LEN = 63  # Need at least 63 days for statistical analysis
 
-    
-    def calculate_returns(self, prices: list) -> list:
-        """Calculate daily percentage returns"""
-        if len(prices) < 2:
-            return []
-        
-        returns = []
-        for i in range(1, len(prices)):
-            prev_close = prices[i-1].get('close', 0)
-            curr_close = prices[i].get('close', 0)
-            if prev_close > 0:
-                ret = (curr_close - prev_close) / prev_close * 100
-                returns.append(ret)
-            else:
-                returns.append(0)
-        return returns
     
     def calculate_skewness(self, data: list) -> float:
         """Calculate skewness of a dataset"""
         if len(data) < 3:
             return 0
-            
-        n = len(data)
-        mean = sum(data) / n
-        std = math.sqrt(sum((x - mean) ** 2 for x in data) / (n - 1)) if n > 1 else 0
-        
-        if std == 0:
-            return 0
-            
-        # Calculate skewness
-        skew = sum(((x - mean) / std) ** 3 for x in data) * n / ((n - 1) * (n - 2))
-        return skew
+        return _skew_kurt(np.ascontiguousarray(data, dtype=np.float64))[0]
     
     def calculate_kurtosis(self, data: list) -> float:
         """Calculate kurtosis of a dataset"""
         if len(data) < 4:
             return 3  # Normal distribution kurtosis
-            
-        n = len(data)
-        mean = sum(data) / n
-        std = math.sqrt(sum((x - mean) ** 2 for x in data) / (n - 1)) if n > 1 else 0
-        
-        if std == 0:
-            return 3
-            
-        # Calculate kurtosis
-        kurt = sum(((x - mean) / std) ** 4 for x in data) * n * (n + 1) / ((n - 1) * (n - 2) * (n - 3)) - 3 * (n - 1) ** 2 / ((n - 2) * (n - 3))
-        return kurt
+        return _skew_kurt(np.ascontiguousarray(data, dtype=np.float64))[1]
     
-    def calculate_hurst_exponent(self, prices: list, max_lag: int = 20) -> float:
+    def calculate_hurst_exponent(self, closes: np.ndarray, max_lag: int = 20) -> float:
         """Calculate Hurst Exponent to determine long-term memory of time series
         H < 0.5: Mean reverting series
         H = 0.5: Random walk
         H > 0.5: Trending series
         """
-        if len(prices) < max_lag * 2:
+        if len(closes) < max_lag * 2:
             return 0.5  # Default to random walk
         
-        closes = [price.get('close', 0) for price in prices if price.get('close')]
+        closes = closes[closes != 0]
         if len(closes) < max_lag * 2:
             return 0.5  # Default to random walk
         
@@ -80,63 +104,39 @@ class StatisticalArbitrageAnalysis():
         if len(lags) < 2:
             return 0.5
             
-        # Calculate tau values
+        # Calculate tau values, every lag is shorter than len(closes) // 4 so each diff series has plenty of points
         tau = []
         for lag in lags:
-            if lag < len(closes):
-                diffs = [abs(closes[i] - closes[i-lag]) for i in range(lag, len(closes))]
-                if diffs:
-                    std_dev = math.sqrt(sum((x - sum(diffs)/len(diffs))**2 for x in diffs) / (len(diffs) - 1)) if len(diffs) > 1 else 0
-                    if std_dev > 0:
-                        tau.append(max(1e-8, std_dev))
-                    else:
-                        tau.append(1e-8)
-                else:
-                    tau.append(1e-8)
-            else:
-                tau.append(1e-8)
+            diffs = np.abs(closes[lag:] - closes[:-lag])
+            tau.append(max(1e-8, float(diffs.std(ddof=1))))
         
         # Estimate Hurst exponent from log-log regression
-        if len(lags) >= 2 and len(tau) >= 2:
-            log_lags = [math.log(lag) for lag in lags if lag > 0]
-            log_tau = [math.log(t) for t in tau if t > 0]
-            
-            if len(log_lags) >= 2 and len(log_tau) >= 2:
-                # Simple linear regression to estimate slope (Hurst exponent)
-                n = min(len(log_lags), len(log_tau))
-                if n >= 2:
-                    sum_x = sum(log_lags[:n])
-                    sum_y = sum(log_tau[:n])
-                    sum_xy = sum(log_lags[i] * log_tau[i] for i in range(n))
-                    sum_xx = sum(log_lags[i] ** 2 for i in range(n))
-                    
-                    denominator = n * sum_xx - sum_x ** 2
-                    if abs(denominator) > 1e-10:  # Avoid division by zero
-                        hurst = (n * sum_xy - sum_x * sum_y) / denominator
-                        return max(0, min(1, hurst))  # Clamp between 0 and 1
-        
-        return 0.5  # Default to random walk
+        log_lags = np.log(np.asarray(lags, dtype=np.float64))
+        log_tau = np.log(np.clip(np.asarray(tau, dtype=np.float64), 1e-12, None))
+        try:
+            hurst = np.polyfit(log_lags, log_tau, 1)[0]
+        except (np.linalg.LinAlgError, ValueError):
+            return 0.5  # Default to random walk
+        return float(np.clip(hurst, 0, 1))  # Clamp between 0 and 1
     
-    def analyze(self, prices: list) -> dict[str, any]:
+    def analyze(self, price_arrays: dict) -> dict[str, any]:
         """Analyze statistical arbitrage signals based on price action analysis."""
         result = {"score": 0, "max_score": 10, "details": [], "indicators": {}}
-        if not prices or len(prices) < 63:  # Need at least 63 days for statistical analysis
-            result["details"].append('Insufficient price data for statistical arbitrage analysis (need at least 63 days)')
-            return result
+        closes = price_arrays['closes']
+        if len(closes) < self.MIN_LEN:
+            return self.insufficient_data_analysis()
 
-        # Calculate returns
-        returns = self.calculate_returns(prices)
+        returns = price_arrays['returns']
         if len(returns) < 63:
             result["details"].append('Insufficient return data for statistical arbitrage analysis')
             return result
         
         # Calculate price distribution statistics
         # Skewness and kurtosis (63-day window)
-        skew = self.calculate_skewness(returns[-63:]) if len(returns) >= 63 else 0
-        kurt = self.calculate_kurtosis(returns[-63:]) if len(returns) >= 63 else 3
+        skew, kurt = _skew_kurt(returns[-63:])
         
         # Test for mean reversion using Hurst exponent
-        hurst = self.calculate_hurst_exponent(prices)
+        hurst = self.calculate_hurst_exponent(closes)
         
         # Store indicators
         result["indicators"] = {
@@ -148,74 +148,21 @@ class StatisticalArbitrageAnalysis():
         score = 5  # Start with neutral score
         reasoning = []
         
-        # Generate signal based on statistical properties
-        if hurst < 0.4 and skew > 1:
-            score += 2  # Strong bullish mean reversion signal
-            reasoning.append(f"Strong mean reversion signal (Hurst: {hurst:.3f}, Skewness: {skew:.2f})")
-        elif hurst < 0.4 and skew < -1:
-            score -= 2  # Strong bearish mean reversion signal
-            reasoning.append(f"Strong mean reversion signal (Hurst: {hurst:.3f}, Skewness: {skew:.2f})")
-        elif hurst < 0.45:
-            score += 1  # Moderate mean reversion tendency
-            reasoning.append(f"Mean reversion tendency (Hurst: {hurst:.3f})")
-        elif hurst > 0.55:
-            score -= 1  # Trending tendency
-            reasoning.append(f"Trending tendency (Hurst: {hurst:.3f})")
-        else:
-            reasoning.append(f"Random walk characteristics (Hurst: {hurst:.3f})")
-        
-        # Skewness analysis
-        if skew > 2:
-            score += 1  # Positive skew - more positive outliers
-            reasoning.append(f"Positive return skewness ({skew:.2f}) - favorable for long positions")
-        elif skew < -2:
-            score -= 1  # Negative skew - more negative outliers
-            reasoning.append(f"Negative return skewness ({skew:.2f}) - unfavorable for long positions")
-        
-        # Kurtosis analysis (fat tails)
-        if kurt > 6:
-            score -= 0.5  # High kurtosis - fat tails, higher risk
-            reasoning.append(f"High kurtosis ({kurt:.2f}) - increased tail risk")
-        elif kurt < 2:
-            score += 0.5  # Low kurtosis - thin tails, more predictable
-            reasoning.append(f"Low kurtosis ({kurt:.2f}) - more predictable returns")
-        
-        # Combined statistical signal
-        if hurst < 0.3 and abs(skew) > 2:
-            if skew > 0:
-                score += 0.5  # Very strong bullish statistical setup
-                reasoning.append(f"Very strong statistical arbitrage setup - mean reversion with positive skew")
-            else:
-                score -= 0.5  # Very strong bearish statistical setup
-                reasoning.append(f"Very strong statistical arbitrage setup - mean reversion with negative skew")
+        hurst_bucket = np.searchsorted(_HURST_BUCKETS, hurst, side='right')
+        skew_bucket = np.searchsorted(_SKEW_BUCKETS, skew, side='right')
+        kurtosis_bucket = np.searchsorted(_KURTOSIS_BUCKETS, kurt, side='right')
+        signals = (
+            _HURST_SIGNALS[hurst_bucket][skew_bucket],  # Mean reversion vs trending
+            _SKEW_SIGNALS[skew_bucket],  # Skewness analysis
+            _KURTOSIS_SIGNALS[kurtosis_bucket],  # Kurtosis analysis (fat tails)
+            _SETUP_SIGNALS.get((hurst_bucket, skew_bucket)),  # Combined statistical signal
+        )
+        for signal in signals:
+            if signal is not None:
+                delta, reason = signal
+                score += delta
+                reasoning.append(reason.format(hurst=hurst, skew=skew, kurt=kurt))
         
         result["score"] = max(0, min(10, score))  # Clamp between 0-10
         result["details"] = reasoning
         return result
-
-    def get_markdown(self, analysis:dict):
-        """
-        Convert analysis to markdown.
-        """
-        markdown_content = markdown.analysis_data(analysis)
-        return markdown_content
-
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        prices = context.get('prices')
-        analysis = self.analyze(prices)
-        analysis['type'] = 'statistical_arbitrage_analysis'
-        analysis['title'] = f'Statistical Arbitrage Analysis'
-
-        analysis_data['statistical_arbitrage_analysis'] = analysis
-        ai_message = AIMessage(content=self.get_markdown(analysis))
-        return {
-            "context": context,
-            "messages": [
-                ai_message
-            ]
-        }
\ No newline at end of file
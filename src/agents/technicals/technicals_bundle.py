@@ -0,0 +1,35 @@
+from common.agent_state import AgentState
+from langchain.schema import AIMessage
+from langchain_core.runnables import RunnableConfig
+from typing import Dict, Any
+from langgraph.types import StreamWriter
+from common.price_arrays import to_price_arrays
+
+
+class TechnicalsBundle():
+    """
+    Runs the technical analyzers one after another in one node, their messages come out in analyzer order.
+    Each works on a few hundred prices, which takes less time than handing the work to a thread pool would.
+    options['analyzers'] is the list of analyzers, each providing run(context, price_arrays) and get_markdown(analysis).
+    The price arrays are built once per call and passed to every analyzer, they never enter the graph state.
+    """
+    def __init__(self, options: Dict[str, Any]):
+        self.options = options
+        self.analyzers = options['analyzers']
+
+    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        context = state.get('context')
+        analysis_data = context.get('analysis_data')
+        if analysis_data is None:
+            analysis_data = {}
+            context['analysis_data'] = analysis_data
+        price_arrays = to_price_arrays(context.get('prices'))
+        messages = []
+        for analyzer in self.analyzers:
+            analysis = analyzer.run(context, price_arrays)
+            analysis_data[analysis['type']] = analysis
+            messages.append(AIMessage(content=analyzer.get_markdown(analysis)))
+        return {
+            "context": context,
+            "messages": messages
+        }
@@ -1,88 +1,118 @@
-from common.agent_state import AgentState
-from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
-from langchain_core.runnables import RunnableConfig
 from typing import Dict, Any
 import time
-from common import markdown
-from langgraph.types import StreamWriter
+from agents.technicals.price_analysis_node import PriceAnalysisNode
+from functools import lru_cache
 import math
+import numpy as np
 
 
-class TrendAnalysis():
-    def __init__(self, options: Dict[str, Any]):
-        self.options = options
+# EMA periods used by analyze and their smoothing factors
+_EMA_PERIODS = (8, 21, 55)
+_EMA_MULT = {period: 2 / (period + 1) for period in _EMA_PERIODS}
+
+
+def _ema_weights(period: int, n: int) -> np.ndarray:
+    """Weights w such that w @ window is the EMA of an n-close window seeded with window[0]"""
+    multiplier = _EMA_MULT.get(period) or 2 / (period + 1)
+    # Closed form of ema = close * multiplier + ema * (1 - multiplier)
+    weights = (1 - multiplier) ** np.arange(n - 1, -1, -1, dtype=np.float64)
+    weights[1:] *= multiplier
+    return weights
+
+
+@lru_cache(maxsize=8)
+def _ema_weight_matrix(periods: tuple) -> np.ndarray:
+    """One row of EMA weights per period, each right-aligned over its own 3 * period window"""
+    matrix = np.zeros((len(periods), 3 * max(periods)), dtype=np.float64)
+    for row, period in enumerate(periods):
+        matrix[row, -3 * period:] = _ema_weights(period, 3 * period)
+    return matrix
+
+
+def _calc_ema(closes: np.ndarray, period: int) -> float:
+    """EMA over the last 3 * period closes, 0 when fewer than period closes are available"""
+    if len(closes) < period:
+        return 0
+    # Use a longer window so the recursion has time to warm up past the seed value
+    window = closes[-3 * period:]
+    return float(_ema_weights(period, len(window)) @ window)
+
+
+def _calc_emas(closes: np.ndarray, periods: tuple = _EMA_PERIODS) -> dict[int, float]:
+    """EMA for every period from a single matrix-vector product over the shared closes"""
+    window = 3 * max(periods)
+    if len(closes) < window:
+        return {period: _calc_ema(closes, period) for period in periods}
+    emas = _ema_weight_matrix(periods) @ closes[-window:]
+    return {period: float(ema) for period, ema in zip(periods, emas)}
+
+
+# Scoring tables keyed by (short_trend, medium_trend)
+_TREND_SIGNALS = {
+    (True, True): (2, "Strong bullish trend confirmed across multiple timeframes"),
+    (False, False): (-2, "Strong bearish trend confirmed across multiple timeframes"),
+    (True, False): (1, "Weak bullish trend on short-term timeframe"),
+    (False, True): (0.5, "Mixed trend signals - short-term bearish, long-term bullish"),
+}
+# ADX buckets from np.searchsorted(..., side='right'): < 20, [20, 25], > 25
+_ADX_BUCKETS = np.array([20, np.nextafter(25, np.inf)])
+_WEAK_TREND_STRENGTH = (0, "Weak trend strength (ADX: {adx:.1f})")
+# (delta, reason) indexed by ADX bucket, then keyed by trend direction
+_ADX_SIGNALS = (
+    dict.fromkeys(_TREND_SIGNALS, _WEAK_TREND_STRENGTH),
+    {},
+    {
+        (True, True): (1, "Strong trend strength (ADX: {adx:.1f})"),
+        (False, False): (-1, "Strong trend strength (ADX: {adx:.1f})"),
+    },
+)
+
+
+class TrendAnalysis(PriceAnalysisNode):
+    analysis_type = 'trend_analysis'
+    analysis_title = 'Trend Analysis'
+    MIN_LEN = 55
 
     
-    def calculate_ema(self, prices: list, period: int) -> float:
-        """Calculate Exponential Moving Average"""
-        if len(prices) < period:
-            return 0
-        
-        closes = [price.get('close', 0) for price in prices[-period:] if price.get('close')]
-        if len(closes) < period:
-            return 0
-            
-        # Simple EMA calculation
-        multiplier = 2 / (period + 1)
-        ema = closes[0]
-        for i in range(1, len(closes)):
-            ema = (closes[i] * multiplier) + (ema * (1 - multiplier))
-        return ema
+    def calculate_ema(self, closes: np.ndarray, period: int) -> float:
+        """Calculate Exponential Moving Average over the last 3 * period closes"""
+        return _calc_ema(closes, period)
     
-    def calculate_adx(self, prices: list, period: int = 14) -> dict:
+    def calculate_adx(self, price_arrays: dict, period: int = 14) -> dict:
         """Calculate Average Directional Index (simplified version)"""
-        if len(prices) < period + 1:
+        if len(price_arrays['closes']) < period + 1:
             return {"adx": 0, "+di": 0, "-di": 0}
         
         # Simplified ADX calculation
-        closes = [price.get('close', 0) for price in prices[-(period+1):] if price.get('close')]
-        highs = [price.get('high', 0) for price in prices[-(period+1):] if price.get('high')]
-        lows = [price.get('low', 0) for price in prices[-(period+1):] if price.get('low')]
+        closes = price_arrays['closes'][-(period+1):]
+        highs = price_arrays['highs'][-(period+1):]
+        lows = price_arrays['lows'][-(period+1):]
+        closes = closes[closes != 0]
+        highs = highs[highs != 0]
+        lows = lows[lows != 0]
         
         if len(closes) < period + 1:
             return {"adx": 0, "+di": 0, "-di": 0}
         
-        # Calculate True Range and Directional Movement (simplified)
-        tr_values = []
-        plus_dm_values = []
-        minus_dm_values = []
-        
-        for i in range(1, len(closes)):
-            high = highs[i]
-            low = lows[i]
-            prev_close = closes[i-1]
-            prev_high = highs[i-1]
-            prev_low = lows[i-1]
-            
-            # True Range
-            tr = max(high - low, abs(high - prev_close), abs(low - prev_close))
-            tr_values.append(tr)
-            
-            # Directional Movement
-            up_move = high - prev_high
-            down_move = prev_low - low
-            
-            if up_move > down_move and up_move > 0:
-                plus_dm = up_move
-                minus_dm = 0
-            elif down_move > up_move and down_move > 0:
-                plus_dm = 0
-                minus_dm = down_move
-            else:
-                plus_dm = 0
-                minus_dm = 0
-                
-            plus_dm_values.append(plus_dm)
-            minus_dm_values.append(minus_dm)
-        
-        if len(tr_values) == 0:
+        if len(highs) != len(closes) or len(lows) != len(closes):
             return {"adx": 0, "+di": 0, "-di": 0}
         
+        # Calculate True Range and Directional Movement (simplified)
+        prev_closes = closes[:-1]
+        tr_values = np.maximum(
+            highs[1:] - lows[1:],
+            np.maximum(np.abs(highs[1:] - prev_closes), np.abs(lows[1:] - prev_closes))
+        )
+        up_moves = highs[1:] - highs[:-1]
+        down_moves = lows[:-1] - lows[1:]
+        plus_dm_values = np.where((up_moves > down_moves) & (up_moves > 0), up_moves, 0.0)
+        minus_dm_values = np.where((down_moves > up_moves) & (down_moves > 0), down_moves, 0.0)
+        
         # Calculate averages
-        avg_tr = sum(tr_values) / len(tr_values)
-        avg_plus_dm = sum(plus_dm_values) / len(plus_dm_values)
-        avg_minus_dm = sum(minus_dm_values) / len(minus_dm_values)
+        avg_tr = float(tr_values.mean())
+        avg_plus_dm = float(plus_dm_values.mean())
+        avg_minus_dm = float(minus_dm_values.mean())
         
         if avg_tr == 0:
             return {"adx": 0, "+di": 0, "-di": 0}
@@ -99,20 +129,21 @@ class TrendAnalysis():
         
         return {"adx": adx, "+di": plus_di, "-di": minus_di}
     
-    def analyze(self, prices: list) -> dict[str, any]:
+    def analyze(self, price_arrays: dict) -> dict[str, any]:
         """Analyze trend following strategy using multiple timeframes and indicators."""
         result = {"score": 0, "max_score": 10, "details": [], "indicators": {}}
-        if not prices or len(prices) < 55:
-            result["details"].append('Insufficient price data for trend analysis (need at least 55 days)')
-            return result
+        if len(price_arrays['closes']) < self.MIN_LEN:
+            return self.insufficient_data_analysis()
 
         # Calculate EMAs for multiple timeframes
-        ema_8 = self.calculate_ema(prices, 8)
-        ema_21 = self.calculate_ema(prices, 21)
-        ema_55 = self.calculate_ema(prices, 55)
+        closes = price_arrays['closes'][price_arrays['closes'] != 0]
+        emas = _calc_emas(closes)
+        ema_8 = emas[8]
+        ema_21 = emas[21]
+        ema_55 = emas[55]
         
         # Calculate ADX for trend strength
-        adx_data = self.calculate_adx(prices, 14)
+        adx_data = self.calculate_adx(price_arrays, 14)
         adx = adx_data["adx"]
         
         # Store indicators
@@ -126,7 +157,7 @@ class TrendAnalysis():
         }
         
         # Determine trend direction and strength
-        current_price = prices[-1].get('close', 0) if prices else 0
+        current_price = float(price_arrays['closes'][-1])
         short_trend = ema_8 > ema_21 if ema_8 > 0 and ema_21 > 0 else False
         medium_trend = ema_21 > ema_55 if ema_21 > 0 and ema_55 > 0 else False
         
@@ -136,32 +167,16 @@ class TrendAnalysis():
         score = 5  # Start with neutral score
         reasoning = []
         
-        # Trend direction scoring
-        if short_trend and medium_trend:
-            score += 2  # Strong bullish trend
-            reasoning.append(f"Strong bullish trend confirmed across multiple timeframes")
-        elif not short_trend and not medium_trend:
-            score -= 2  # Strong bearish trend
-            reasoning.append(f"Strong bearish trend confirmed across multiple timeframes")
-        elif short_trend and not medium_trend:
-            score += 1  # Weak bullish trend
-            reasoning.append(f"Weak bullish trend on short-term timeframe")
-        elif not short_trend and medium_trend:
-            score += 0.5  # Mixed trend signals
-            reasoning.append(f"Mixed trend signals - short-term bearish, long-term bullish")
-        else:
-            reasoning.append(f"No clear trend direction")
-        
-        # Trend strength scoring
-        if adx > 25:
-            if short_trend and medium_trend:
-                score += 1  # Strong trend with strong direction
-                reasoning.append(f"Strong trend strength (ADX: {adx:.1f})")
-            elif not short_trend and not medium_trend:
-                score -= 1  # Strong trend with strong direction (bearish)
-                reasoning.append(f"Strong trend strength (ADX: {adx:.1f})")
-        elif adx < 20:
-            reasoning.append(f"Weak trend strength (ADX: {adx:.1f})")
+        trend_direction = (short_trend, medium_trend)
+        signals = (
+            _TREND_SIGNALS[trend_direction],  # Trend direction scoring
+            _ADX_SIGNALS[np.searchsorted(_ADX_BUCKETS, adx, side='right')].get(trend_direction),  # Trend strength scoring
+        )
+        for signal in signals:
+            if signal is not None:
+                delta, reason = signal
+                score += delta
+                reasoning.append(reason.format(adx=adx))
         
         # Price vs EMA positioning
         if current_price > 0 and ema_8 > 0 and ema_21 > 0:
@@ -175,30 +190,3 @@ class TrendAnalysis():
         result["score"] = max(0, min(10, score))  # Clamp between 0-10
         result["details"] = reasoning
         return result
-
-    def get_markdown(self, analysis:dict):
-        """
-        Convert analysis to markdown.
-        """
-        markdown_content = markdown.analysis_data(analysis)
-        return markdown_content
-
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        prices = context.get('prices')
-        analysis = self.analyze(prices)
-        analysis['type'] = 'trend_analysis'
-        analysis['title'] = f'Trend Analysis'
-
-        analysis_data['trend_analysis'] = analysis
-        ai_message = AIMessage(content=self.get_markdown(analysis))
-        return {
-            "context": context,
-            "messages": [
-                ai_message
-            ]
-        }
\ No newline at end of file
@@ -1,90 +1,107 @@
-from common.agent_state import AgentState
-from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
-from langchain_core.runnables import RunnableConfig
 from typing import Dict, Any
 import time
-from common import markdown
-from langgraph.types import StreamWriter
+from agents.technicals.price_analysis_node import PriceAnalysisNode
 import math
+import numpy as np
 
 
-class VolatilityAnalysis():
-    def __init__(self, options: Dict[str, Any]):
-        self.options = options
+_SQRT_252 = math.sqrt(252)  # trading days per year, annualizes daily volatility
+# Recent vs prior 21-day volatility ratios that count as a volatility trend
+_VOL_RISING_RATIO = 1.2
+_VOL_FALLING_RATIO = 0.8
+
+# Scoring tables. Buckets come from np.searchsorted(..., side='right'); np.nextafter turns a
+# threshold into a strict "greater than" boundary so the tables match the original comparisons.
+# Volatility regime buckets: < 0.8, < 0.9, [0.9, 1.1], > 1.1, > 1.2
+_REGIME_BUCKETS = np.array([0.8, 0.9, np.nextafter(1.1, np.inf), np.nextafter(1.2, np.inf)])
+# Volatility z-score buckets: < -1, [-1, 1], > 1
+_Z_SCORE_BUCKETS = np.array([-1, np.nextafter(1, np.inf)])
+# ATR ratio buckets: < 0.5%, [0.5%, 2%], > 2%
+_ATR_RATIO_BUCKETS = np.array([0.005, np.nextafter(0.02, np.inf)])
+
+_LOW_VOL_EXPANSION = (2, "Low volatility regime with mean reversion signal - potential for expansion")
+_HIGH_VOL_CONTRACTION = (-2, "High volatility regime with mean reversion signal - potential for contraction")
+_MODERATELY_LOW_VOL = (1, "Moderately low volatility regime - cautious bullish")
+_MODERATELY_HIGH_VOL = (-1, "Moderately high volatility regime - cautious bearish")
+_NORMAL_VOL = (0, "Normal volatility regime")
+
+# (delta, reason) indexed by [regime bucket][z-score bucket]
+_REGIME_SIGNALS = (
+    (_LOW_VOL_EXPANSION, _MODERATELY_LOW_VOL, _MODERATELY_LOW_VOL),
+    (_MODERATELY_LOW_VOL,) * 3,
+    (_NORMAL_VOL,) * 3,
+    (_MODERATELY_HIGH_VOL,) * 3,
+    (_MODERATELY_HIGH_VOL, _MODERATELY_HIGH_VOL, _HIGH_VOL_CONTRACTION),
+)
+# (delta, reason) indexed by ATR ratio bucket, then keyed by whether the score is already bullish
+_ATR_SIGNALS = (
+    dict.fromkeys((True, False), (0, "Low volatility environment (ATR ratio: {atr_ratio:.3f})")),
+    dict.fromkeys((True, False), (0, "Moderate volatility environment (ATR ratio: {atr_ratio:.3f})")),
+    {
+        True: (0.5, "High volatility confirming trend (ATR ratio: {atr_ratio:.3f})"),
+        False: (-0.5, "High volatility increasing risk (ATR ratio: {atr_ratio:.3f})"),
+    },
+)
+
+
+def _rolling_std(data: np.ndarray, window: int) -> np.ndarray:
+    """Sample standard deviation of every `window`-length slice: out[j] = std(data[j:j+window])"""
+    return np.lib.stride_tricks.sliding_window_view(data, window).std(axis=1, ddof=1)
+
+
+class VolatilityAnalysis(PriceAnalysisNode):
+    analysis_type = 'volatility_analysis'
+    analysis_title = 'Volatility Analysis'
+    MIN_LEN = 63  # Need at least 63 days for volatility analysis
 
     
-    def calculate_returns(self, prices: list) -> list:
-        """Calculate daily percentage returns"""
-        if len(prices) < 2:
-            return []
-        
-        returns = []
-        for i in range(1, len(prices)):
-            prev_close = prices[i-1].get('close', 0)
-            curr_close = prices[i].get('close', 0)
-            if prev_close > 0:
-                ret = (curr_close - prev_close) / prev_close * 100
-                returns.append(ret)
-            else:
-                returns.append(0)
-        return returns
-    
-    def calculate_std(self, data: list) -> float:
+    def calculate_std(self, data: np.ndarray) -> float:
         """Calculate Standard Deviation"""
         if len(data) < 2:
             return 0
-            
-        mean = sum(data) / len(data)
-        variance = sum((x - mean) ** 2 for x in data) / (len(data) - 1)
-        return math.sqrt(variance)
+        return float(np.std(data, ddof=1))
     
-    def calculate_atr(self, prices: list, period: int = 14) -> float:
+    def calculate_atr(self, price_arrays: dict, period: int = 14) -> float:
         """Calculate Average True Range"""
-        if len(prices) < period + 1:
+        closes = price_arrays['closes']
+        if len(closes) < period + 1:
             return 0
         
-        tr_values = []
-        for i in range(1, len(prices)):
-            high = prices[i].get('high', 0)
-            low = prices[i].get('low', 0)
-            prev_close = prices[i-1].get('close', 0)
-            
-            # True Range
-            tr1 = high - low
-            tr2 = abs(high - prev_close)
-            tr3 = abs(low - prev_close)
-            tr = max(tr1, tr2, tr3)
-            tr_values.append(tr)
+        highs = price_arrays['highs'][-period:]
+        lows = price_arrays['lows'][-period:]
+        prev_closes = closes[-(period + 1):-1]
         
-        if len(tr_values) < period:
-            return 0
+        # True Range
+        tr_values = np.maximum(highs - lows, np.maximum(np.abs(highs - prev_closes), np.abs(lows - prev_closes)))
             
         # Simple moving average of TR values
-        atr = sum(tr_values[-period:]) / period
-        return atr
+        return float(tr_values.mean())
     
-    def analyze(self, prices: list) -> dict[str, any]:
+    def analyze(self, price_arrays: dict) -> dict[str, any]:
         """Analyze volatility-based trading strategy."""
         result = {"score": 0, "max_score": 10, "details": [], "indicators": {}}
-        if not prices or len(prices) < 63:  # Need at least 63 days for volatility analysis
-            result["details"].append('Insufficient price data for volatility analysis (need at least 63 days)')
-            return result
+        closes = price_arrays['closes']
+        if len(closes) < self.MIN_LEN:
+            return self.insufficient_data_analysis()
 
-        # Calculate returns
-        returns = self.calculate_returns(prices)
+        returns = price_arrays['returns']
         if len(returns) < 21:
             result["details"].append('Insufficient return data for volatility analysis')
             return result
         
+        # Rolling 21-day volatility, one entry per window start: rolling_std_21[j] = std(returns[j:j+21])
+        # All 21-day metrics below are slices of this one array
+        rolling_std_21 = _rolling_std(returns, 21)
+        
         # Calculate various volatility metrics
         # Historical volatility (21-day)
-        hist_vol_21 = self.calculate_std(returns[-21:]) if len(returns) >= 21 else 0
+        hist_vol_21 = float(rolling_std_21[-1])
         # Historical volatility (63-day)
         hist_vol_63 = self.calculate_std(returns[-63:]) if len(returns) >= 63 else 0
         
         # Annualized volatility
-        annualized_vol = hist_vol_21 * math.sqrt(252) if hist_vol_21 > 0 else 0
+        annualized_vol = hist_vol_21 * _SQRT_252 if hist_vol_21 > 0 else 0
         
         # Volatility regime detection
         if len(returns) >= 84:  # Need 84 days for 63-day MA + 21-day current
@@ -95,14 +112,16 @@ class VolatilityAnalysis():
         
         # Volatility mean reversion (z-score)
         if len(returns) >= 84:
-            vol_std_63 = self.calculate_std([self.calculate_std(returns[i:i+21]) for i in range(len(returns)-84, len(returns)-21, 1)]) if len(returns) >= 84 else 0
-            vol_z_score = (hist_vol_21 - (sum([self.calculate_std(returns[i:i+21]) for i in range(len(returns)-84, len(returns)-21, 1)]) / 63)) / vol_std_63 if vol_std_63 > 0 else 0
+            # 63 rolling volatilities ending one day before the latest window
+            vol_series = rolling_std_21[-64:-1]
+            vol_std_63 = float(vol_series.std(ddof=1))
+            vol_z_score = (hist_vol_21 - float(vol_series.mean())) / vol_std_63 if vol_std_63 > 0 else 0
         else:
             vol_z_score = 0
         
         # ATR ratio
-        atr = self.calculate_atr(prices, 14)
-        current_price = prices[-1].get('close', 0) if prices else 0
+        atr = self.calculate_atr(price_arrays, 14)
+        current_price = float(closes[-1])
         atr_ratio = atr / current_price if current_price > 0 and atr > 0 else 0
         
         # Store indicators
@@ -120,72 +139,27 @@ class VolatilityAnalysis():
         reasoning = []
         
         # Generate signal based on volatility regime
-        if vol_regime < 0.8 and vol_z_score < -1:
-            score += 2  # Low vol regime, potential for expansion
-            reasoning.append(f"Low volatility regime with mean reversion signal - potential for expansion")
-        elif vol_regime > 1.2 and vol_z_score > 1:
-            score -= 2  # High vol regime, potential for contraction
-            reasoning.append(f"High volatility regime with mean reversion signal - potential for contraction")
-        elif vol_regime < 0.9:
-            score += 1  # Moderately low volatility
-            reasoning.append(f"Moderately low volatility regime - cautious bullish")
-        elif vol_regime > 1.1:
-            score -= 1  # Moderately high volatility
-            reasoning.append(f"Moderately high volatility regime - cautious bearish")
-        else:
-            reasoning.append(f"Normal volatility regime")
+        delta, reason = _REGIME_SIGNALS[np.searchsorted(_REGIME_BUCKETS, vol_regime, side='right')][
+            np.searchsorted(_Z_SCORE_BUCKETS, vol_z_score, side='right')]
+        score += delta
+        reasoning.append(reason)
         
-        # ATR analysis
-        if atr_ratio > 0.02:  # 2% ATR ratio is high
-            if score > 5:  # Already bullish
-                score += 0.5  # High volatility confirming bullish signal
-                reasoning.append(f"High volatility confirming trend (ATR ratio: {atr_ratio:.3f})")
-            else:
-                score -= 0.5  # High volatility increasing risk
-                reasoning.append(f"High volatility increasing risk (ATR ratio: {atr_ratio:.3f})")
-        elif atr_ratio < 0.005:  # 0.5% ATR ratio is low
-            reasoning.append(f"Low volatility environment (ATR ratio: {atr_ratio:.3f})")
-        else:
-            reasoning.append(f"Moderate volatility environment (ATR ratio: {atr_ratio:.3f})")
+        # ATR analysis, high volatility confirms an already bullish score and adds risk otherwise
+        delta, reason = _ATR_SIGNALS[np.searchsorted(_ATR_RATIO_BUCKETS, atr_ratio, side='right')][score > 5]
+        score += delta
+        reasoning.append(reason.format(atr_ratio=atr_ratio))
         
         # Volatility trend
         if len(returns) >= 42:
-            recent_vol = self.calculate_std(returns[-21:])  # Last 21 days
-            prior_vol = self.calculate_std(returns[-42:-21])  # Prior 21 days
-            if recent_vol > prior_vol * 1.2:
+            recent_vol = rolling_std_21[-1]  # Last 21 days
+            prior_vol = rolling_std_21[-22]  # Prior 21 days
+            if recent_vol > prior_vol * _VOL_RISING_RATIO:
                 score -= 0.5  # Volatility increasing
                 reasoning.append(f"Volatility increasing rapidly")
-            elif recent_vol < prior_vol * 0.8:
+            elif recent_vol < prior_vol * _VOL_FALLING_RATIO:
                 score += 0.5  # Volatility decreasing
                 reasoning.append(f"Volatility decreasing")
         
         result["score"] = max(0, min(10, score))  # Clamp between 0-10
         result["details"] = reasoning
         return result
-
-    def get_markdown(self, analysis:dict):
-        """
-        Convert analysis to markdown.
-        """
-        markdown_content = markdown.analysis_data(analysis)
-        return markdown_content
-
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        prices = context.get('prices')
-        analysis = self.analyze(prices)
-        analysis['type'] = 'volatility_analysis'
-        analysis['title'] = f'Volatility Analysis'
-
-        analysis_data['volatility_analysis'] = analysis
-        ai_message = AIMessage(content=self.get_markdown(analysis))
-        return {
-            "context": context,
-            "messages": [
-                ai_message
-            ]
-        }
\ No newline at end of file
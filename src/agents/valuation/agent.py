@@ -3,6 +3,8 @@ This is the main entry point for the valuation agent.
 It defines the workflow graph, state, tools, nodes and edges.
 """
 
+import asyncio
+import json
 import time
 from common.agent_state import AgentState
 from common.util import get_dict_json
@@ -23,77 +25,19 @@ from agents.valuation.ev_ebitda_analysis import EVEBITDAAnalysis
 from agents.valuation.residual_income_analysis import ResidualIncomeAnalysis
 
 from nodes.next_step_suggestions import NextStepSuggestions
+from nodes.analysis_bundle import AnalysisBundle
 
 from nodes.ticker_search import TickerSearch
 from typing_extensions import Literal
 from common import markdown
 from common.dataset import Dataset
 
-next_step_suggestions_node = NextStepSuggestions({})
-dcf_analysis_node = DCFAnalysis({})
-owner_earnings_analysis_node = OwnerEarningsAnalysis({})
-ev_ebitda_analysis_node = EVEBITDAAnalysis({})
-residual_income_analysis_node = ResidualIncomeAnalysis({})
-
-async def start_analysis(state: AgentState, config: RunnableConfig):
-    
-    end_date = state.get('action').get('parameters').get('end_date')
-    end_date = end_date if end_date else time.strftime("%Y-%m-%d")
-
-    context = state.get('context')
-    ticker = context.get('current_task').get('ticker')
-    
-    # Get financial metrics for valuation analysis
-    dataset_client = Dataset(config)
-    metrics = dataset_client.get_financial_items(ticker.get('symbol'), [
-        "free_cash_flow", "net_income", "depreciation_and_amortization", 
-        "capital_expenditure", "working_capital", "enterprise_value",
-        "enterprise_value_to_ebitda_ratio", "market_cap", "book_value",
-        "earnings_growth", "price_to_book_ratio", "return_on_equity"
-    ], end_date, period="ttm")
-    
-    context['metrics'] = metrics
-    
-    # Get additional historical data for median calculations
-    historical_metrics = dataset_client.get_financial_items(ticker.get('symbol'), [
-        "enterprise_value_to_ebitda_ratio", "price_to_book_ratio", "return_on_equity"
-    ], end_date, period="yearly")
-    
-    context['historical_metrics'] = historical_metrics
-    
-    return {
-        'context': context,
-        'messages':[AIMessage(content=markdown.to_h2('Valuation Analysis for '+ ticker.get('symbol')))]
-    }
-
-async def end_analysis(state: AgentState, config: RunnableConfig):
-    context = state.get('context')
-    ticker = context.get('current_task').get('ticker')
-    analysis_data = context.get('analysis_data')
-
-    # Calculate total score
-    total_score = (
-        analysis_data.get('dcf_analysis').get("score") + 
-        analysis_data.get('owner_earnings_analysis').get("score") + 
-        analysis_data.get('ev_ebitda_analysis').get("score") + 
-        analysis_data.get('residual_income_analysis').get("score")
-    )
-    
-    # Update max possible score calculation
-    max_possible_score = (
-        analysis_data.get('dcf_analysis').get("max_score") + 
-        analysis_data.get('owner_earnings_analysis').get("max_score") + 
-        analysis_data.get('ev_ebitda_analysis').get("max_score") + 
-        analysis_data.get('residual_income_analysis').get("max_score")
-    )
+# DCF, owner earnings, EV/EBITDA and residual income analysis each score out of 10
+MAX_POSSIBLE_SCORE = 40
 
-    analysis_data['total_score'] = total_score
-    analysis_data['max_possible_score'] = max_possible_score
+_HISTORICAL_FIELDS = ["enterprise_value_to_ebitda_ratio", "price_to_book_ratio", "return_on_equity"]
 
-    messages = [
-            (
-                "system",
-                """You are a world-class valuation analyst. Analyze investment opportunities using proven valuation methodologies:
+_VALUATION_SYSTEM_PROMPT = """You are a world-class valuation analyst. Analyze investment opportunities using proven valuation methodologies:
 
                 VALUATION METHODOLOGIES:
                 1. Discounted Cash Flow (DCF): Intrinsic value based on projected free cash flows
@@ -124,11 +68,9 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
                 - 10-29%: Poor valuation setup or significant overvaluation
 
                 Remember: Price is what you pay, value is what you get. Always consider the margin of safety and the quality of the underlying business.
-                """,
-            ),
-            (
-                "human",
-                f"""Analyze this valuation opportunity for {ticker.get('symbol')} ({ticker.get('short_name')}):
+                """
+
+_VALUATION_HUMAN_TEMPLATE = """Analyze this valuation opportunity for {symbol} ({short_name}):
 
                 COMPREHENSIVE VALUATION ANALYSIS DATA:
                 {analysis_data}
@@ -152,9 +94,75 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
                 7. Key risks and limitations in the analysis
 
                 Write as a professional valuation analyst would speak - with precision, financial knowledge, and specific references to the data provided.
-                """,
-            ),
-        ]
+                """
+
+next_step_suggestions_node = NextStepSuggestions({})
+dcf_analysis_node = DCFAnalysis({})
+owner_earnings_analysis_node = OwnerEarningsAnalysis({})
+ev_ebitda_analysis_node = EVEBITDAAnalysis({})
+residual_income_analysis_node = ResidualIncomeAnalysis({})
+valuation_bundle_node = AnalysisBundle({'analyzers': [
+    dcf_analysis_node, owner_earnings_analysis_node, ev_ebitda_analysis_node, residual_income_analysis_node
+], 'metric_fields': {'historical_metrics': _HISTORICAL_FIELDS}})
+
+async def start_analysis(state: AgentState, config: RunnableConfig):
+    
+    end_date = state.get('action').get('parameters').get('end_date')
+    end_date = end_date if end_date else time.strftime("%Y-%m-%d")
+
+    context = state.get('context')
+    ticker = context.get('current_task').get('ticker')
+    
+    # Get financial metrics for valuation analysis, plus yearly history for median calculations.
+    # The dataset has no multi-period endpoint, so the two independent requests are issued concurrently.
+    dataset_client = Dataset(config)
+    metrics, historical_metrics = await asyncio.gather(
+        asyncio.to_thread(dataset_client.get_financial_items, ticker.get('symbol'), [
+            "free_cash_flow", "net_income", "depreciation_and_amortization", 
+            "capital_expenditure", "working_capital", "enterprise_value",
+            "enterprise_value_to_ebitda_ratio", "market_cap", "book_value",
+            "earnings_growth", "price_to_book_ratio", "return_on_equity"
+        ], end_date, period="ttm"),
+        asyncio.to_thread(dataset_client.get_financial_items, ticker.get('symbol'), _HISTORICAL_FIELDS, end_date, period="yearly"),
+    )
+    
+    context['metrics'] = metrics
+    context['historical_metrics'] = historical_metrics
+    
+    return {
+        'context': context,
+        'messages':[AIMessage(content=markdown.to_h2('Valuation Analysis for '+ ticker.get('symbol')))]
+    }
+
+async def end_analysis(state: AgentState, config: RunnableConfig):
+    context = state.get('context')
+    ticker = context.get('current_task').get('ticker')
+    analysis_data = context.get('analysis_data')
+
+    # Calculate total score
+    total_score = (
+        analysis_data.get('dcf_analysis').get("score") + 
+        analysis_data.get('owner_earnings_analysis').get("score") + 
+        analysis_data.get('ev_ebitda_analysis').get("score") + 
+        analysis_data.get('residual_income_analysis').get("score")
+    )
+    
+    analysis_data['total_score'] = total_score
+    analysis_data['max_possible_score'] = MAX_POSSIBLE_SCORE
+
+    # Send the scores and the numbers behind them as compact JSON, the details prose is derived from the same numbers
+    prompt_data = {
+        name: {"score": analysis["score"], "indicators": analysis["indicators"]} if isinstance(analysis, dict) else analysis
+        for name, analysis in analysis_data.items()
+    }
+
+    messages = [
+        ("system", _VALUATION_SYSTEM_PROMPT),
+        ("human", _VALUATION_HUMAN_TEMPLATE.format(
+            symbol=ticker.get('symbol'), short_name=ticker.get('short_name'),
+            analysis_data=json.dumps(prompt_data, separators=(",", ":"), default=str)
+        )),
+    ]
     response = await ainvoke(messages, config, analyzer=True)
     
     return {
@@ -167,18 +175,12 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
 workflow = StateGraph(AgentState)
 workflow.add_node("start_analysis", start_analysis)
 
-workflow.add_node("dcf_analysis", dcf_analysis_node)
-workflow.add_node("owner_earnings_analysis", owner_earnings_analysis_node)
-workflow.add_node("ev_ebitda_analysis", ev_ebitda_analysis_node)
-workflow.add_node("residual_income_analysis", residual_income_analysis_node)
+workflow.add_node("valuation_bundle", valuation_bundle_node)
 
 workflow.add_node("end_analysis", end_analysis)
 
-workflow.add_edge("start_analysis", "dcf_analysis")
-workflow.add_edge("dcf_analysis", "owner_earnings_analysis")
-workflow.add_edge("owner_earnings_analysis", "ev_ebitda_analysis")
-workflow.add_edge("ev_ebitda_analysis", "residual_income_analysis")
-workflow.add_edge("residual_income_analysis", "end_analysis")
+workflow.add_edge("start_analysis", "valuation_bundle")
+workflow.add_edge("valuation_bundle", "end_analysis")
 
 workflow.set_entry_point("start_analysis")
 workflow.set_finish_point("end_analysis")
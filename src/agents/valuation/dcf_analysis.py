@@ -1,12 +1,45 @@
-from common.agent_state import AgentState
-from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
-from langchain_core.runnables import RunnableConfig
 from typing import Dict, Any
-import time
 from common import markdown
-from langgraph.types import StreamWriter
-import math
+from bisect import bisect_left
+
+
+def _dcf_kernel(free_cash_flow, growth_rate, discount_rate, terminal_growth_rate, num_years):
+    """Closed-form DCF value of a positive free cash flow."""
+    # Growth and discount are constant, so the explicit-period PV is a geometric series
+    ratio = (1 + growth_rate) / (1 + discount_rate)
+    ratio_n = ratio ** num_years
+    series = num_years if ratio == 1 else ratio * (1 - ratio_n) / (1 - ratio)
+    # FCF_n * (1 + g_t) / (r - g_t), discounted back n years
+    terminal = ratio_n * (1 + terminal_growth_rate) / (discount_rate - terminal_growth_rate)
+    return free_cash_flow * (series + terminal)
+
+
+# Margin of safety buckets from bisect_left, each threshold is a strict "greater than":
+# <= -25%, (-25%, -10%], (-10%, 0], (0, 10%], (10%, 25%], (25%, 50%], > 50%
+_MARGIN_OF_SAFETY_THRESHOLDS = (-0.25, -0.10, 0, 0.10, 0.25, 0.5)
+# (delta, reason) indexed by margin of safety bucket
+_MARGIN_OF_SAFETY_SIGNALS = (
+    (-3, "Significant overvaluation ({mos:.1%}) - DCF value: ${iv:,.0f}M vs Market Cap: ${mc:,.0f}M"),
+    (-2, "Moderate overvaluation ({mos:.1%}) - DCF value: ${iv:,.0f}M vs Market Cap: ${mc:,.0f}M"),
+    (-1, "Slight overvaluation ({mos:.1%}) - DCF value: ${iv:,.0f}M vs Market Cap: ${mc:,.0f}M"),
+    (0, "Fair valuation (small margin of safety: {mos:.1%}) - DCF value: ${iv:,.0f}M vs Market Cap: ${mc:,.0f}M"),
+    (1, "Modest margin of safety ({mos:.1%}) - DCF value: ${iv:,.0f}M vs Market Cap: ${mc:,.0f}M"),
+    (2, "Good margin of safety ({mos:.1%}) - DCF value: ${iv:,.0f}M vs Market Cap: ${mc:,.0f}M"),
+    (3, "Strong margin of safety ({mos:.1%}) - DCF value: ${iv:,.0f}M vs Market Cap: ${mc:,.0f}M"),
+)
+
+# Growth rate buckets from bisect_left, strict "greater than": <= 2%, (2%, 4%], (4%, 7%], (7%, 10%], > 10%
+_GROWTH_THRESHOLDS = (0.02, 0.04, 0.07, 0.10)
+# reason indexed by growth rate bucket
+_GROWTH_REASONS = (
+    "Low growth assumption ({growth:.1%}) - limiting valuation",
+    "Conservative growth assumption ({growth:.1%})",
+    "Moderate growth assumption ({growth:.1%})",
+    "Healthy growth assumption ({growth:.1%})",
+    "Conservative growth assumption applied (capped at 10%)",
+)
+
 
 class DCFAnalysis():
     def __init__(self, options: Dict[str, Any]):
@@ -24,17 +57,7 @@ class DCFAnalysis():
         if free_cash_flow is None or free_cash_flow <= 0:
             return 0
 
-        pv = 0.0
-        for yr in range(1, num_years + 1):
-            fcft = free_cash_flow * (1 + growth_rate) ** yr
-            pv += fcft / (1 + discount_rate) ** yr
-
-        term_val = (
-            free_cash_flow * (1 + growth_rate) ** num_years * (1 + terminal_growth_rate)
-        ) / (discount_rate - terminal_growth_rate)
-        pv_term = term_val / (1 + discount_rate) ** num_years
-
-        return pv + pv_term
+        return float(_dcf_kernel(free_cash_flow, growth_rate, discount_rate, terminal_growth_rate, num_years))
 
     def analyze(self, metrics: list) -> dict[str, any]:
         """Analyze DCF valuation."""
@@ -90,68 +113,29 @@ class DCFAnalysis():
             
             result["indicators"]["margin_of_safety"] = margin_of_safety
             
-            if margin_of_safety > 0.5:  # 50%+ margin of safety
-                score += 3
-                reasoning.append(f"Strong margin of safety ({margin_of_safety:.1%}) - DCF value: ${intrinsic_value_safety:,.0f}M vs Market Cap: ${market_cap:,.0f}M")
-            elif margin_of_safety > 0.25:  # 25%+ margin of safety
-                score += 2
-                reasoning.append(f"Good margin of safety ({margin_of_safety:.1%}) - DCF value: ${intrinsic_value_safety:,.0f}M vs Market Cap: ${market_cap:,.0f}M")
-            elif margin_of_safety > 0.10:  # 10%+ margin of safety
-                score += 1
-                reasoning.append(f"Modest margin of safety ({margin_of_safety:.1%}) - DCF value: ${intrinsic_value_safety:,.0f}M vs Market Cap: ${market_cap:,.0f}M")
-            elif margin_of_safety > 0:  # Positive but small margin
-                reasoning.append(f"Fair valuation (small margin of safety: {margin_of_safety:.1%}) - DCF value: ${intrinsic_value_safety:,.0f}M vs Market Cap: ${market_cap:,.0f}M")
-            elif margin_of_safety > -0.10:  # Slightly overvalued
-                score -= 1
-                reasoning.append(f"Slight overvaluation ({margin_of_safety:.1%}) - DCF value: ${intrinsic_value_safety:,.0f}M vs Market Cap: ${market_cap:,.0f}M")
-            elif margin_of_safety > -0.25:  # Moderately overvalued
-                score -= 2
-                reasoning.append(f"Moderate overvaluation ({margin_of_safety:.1%}) - DCF value: ${intrinsic_value_safety:,.0f}M vs Market Cap: ${market_cap:,.0f}M")
-            else:  # Severely overvalued
-                score -= 3
-                reasoning.append(f"Significant overvaluation ({margin_of_safety:.1%}) - DCF value: ${intrinsic_value_safety:,.0f}M vs Market Cap: ${market_cap:,.0f}M")
+            delta, reason = _MARGIN_OF_SAFETY_SIGNALS[bisect_left(_MARGIN_OF_SAFETY_THRESHOLDS, margin_of_safety)]
+            score += delta
+            reasoning.append(reason.format(mos=margin_of_safety, iv=intrinsic_value_safety, mc=market_cap))
         else:
             reasoning.append("Unable to calculate margin of safety - missing market cap data")
         
         # Growth rate assessment
-        if growth_rate > 0.10:
-            reasoning.append(f"Conservative growth assumption applied (capped at 10%)")
-        elif growth_rate > 0.07:
-            reasoning.append(f"Healthy growth assumption ({growth_rate:.1%})")
-        elif growth_rate > 0.04:
-            reasoning.append(f"Moderate growth assumption ({growth_rate:.1%})")
-        elif growth_rate > 0.02:
-            reasoning.append(f"Conservative growth assumption ({growth_rate:.1%})")
-        else:
-            reasoning.append(f"Low growth assumption ({growth_rate:.1%}) - limiting valuation")
+        reasoning.append(_GROWTH_REASONS[bisect_left(_GROWTH_THRESHOLDS, growth_rate)].format(growth=growth_rate))
         
         result["score"] = max(0, min(10, score))  # Clamp between 0-10
         result["details"] = reasoning
         return result
 
+    def run(self, context: dict, metric_columns: dict = None) -> dict[str, any]:
+        """Analyze context['metrics'] and return the result tagged with its type and title."""
+        analysis = self.analyze(context.get('metrics'))
+        analysis['type'] = 'dcf_analysis'
+        analysis['title'] = f'Discounted Cash Flow Analysis'
+        return analysis
+
     def get_markdown(self, analysis:dict):
         """
         Convert analysis to markdown.
         """
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
-
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
-        analysis['type'] = 'dcf_analysis'
-        analysis['title'] = f'Discounted Cash Flow Analysis'
-
-        analysis_data['dcf_analysis'] = analysis
-        ai_message = AIMessage(content=self.get_markdown(analysis))
-        return {
-            "context": context,
-            "messages": [
-                ai_message
-            ]
-        }
\ No newline at end of file
@@ -1,41 +1,82 @@
-from common.agent_state import AgentState
-from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
-from langchain_core.runnables import RunnableConfig
-from typing import Dict, Any
-import time
+from typing import Dict, Any, Iterable
 from common import markdown
-from langgraph.types import StreamWriter
-import math
-from statistics import median
+from itertools import chain
+from common.metric_columns import get_metric_column
+import numpy as np
+from bisect import bisect_left, bisect_right
+
+# Current vs median EV/EBITDA buckets from bisect_right, each threshold is a strict "less than":
+# < -30%, [-30%, -15%), [-15%, -5%), [-5%, 5%), [5%, 15%), [15%, 30%), >= 30%
+_RATIO_COMPARISON_THRESHOLDS = (-0.3, -0.15, -0.05, 0.05, 0.15, 0.30)
+# (delta, reason) indexed by ratio comparison bucket
+_RATIO_COMPARISON_SIGNALS = (
+    (3, "Significant undervaluation (EV/EBITDA: {current:.1f} vs median: {median:.1f})"),
+    (2, "Undervaluation (EV/EBITDA: {current:.1f} vs median: {median:.1f})"),
+    (1, "Slight undervaluation (EV/EBITDA: {current:.1f} vs median: {median:.1f})"),
+    (0, "Fair valuation (EV/EBITDA: {current:.1f} vs median: {median:.1f})"),
+    (-1, "Slight overvaluation (EV/EBITDA: {current:.1f} vs median: {median:.1f})"),
+    (-2, "Overvaluation (EV/EBITDA: {current:.1f} vs median: {median:.1f})"),
+    (-3, "Significant overvaluation (EV/EBITDA: {current:.1f} vs median: {median:.1f})"),
+)
+
+# Absolute EV/EBITDA buckets from bisect_right, strict "less than": < 8, [8, 12), [12, 15), >= 15
+_MULTIPLE_THRESHOLDS = (8, 12, 15)
+# reason indexed by absolute EV/EBITDA bucket
+_MULTIPLE_REASONS = (
+    "Attractive EV/EBITDA multiple ({current:.1f})",
+    "Reasonable EV/EBITDA multiple ({current:.1f})",
+    "Elevated EV/EBITDA multiple ({current:.1f})",
+    "Rich EV/EBITDA multiple ({current:.1f})",
+)
+# Implied value vs market cap buckets from bisect_left, strict "greater than": <= -5%, (-5%, 5%], (5%, 15%], (15%, 30%], > 30%
+_VALUE_GAP_THRESHOLDS = (-0.05, 0.05, 0.15, 0.30)
+# reason indexed by value gap bucket
+_VALUE_GAP_REASONS = (
+    "Valuation concern (implied value: ${implied:,.0f}M vs Market Cap: ${mc:,.0f}M)",
+    "Fair valuation (implied value: ${implied:,.0f}M vs Market Cap: ${mc:,.0f}M)",
+    "Modest value indication (implied value: ${implied:,.0f}M vs Market Cap: ${mc:,.0f}M)",
+    "Value indication (implied value: ${implied:,.0f}M vs Market Cap: ${mc:,.0f}M)",
+    "Strong value indication (implied value: ${implied:,.0f}M vs Market Cap: ${mc:,.0f}M)",
+)
+
 
 class EVEBITDAAnalysis():
     def __init__(self, options: Dict[str, Any]):
         self.options = options
 
-    def calculate_ev_ebitda_value(self, financial_metrics: list):
-        """Implied equity value via median EV/EBITDA multiple."""
-        if not financial_metrics:
-            return 0
-        m0 = financial_metrics[0]
-        if not (m0.get('enterprise_value') and m0.get('enterprise_value_to_ebitda_ratio')):
+    def calculate_ev_ebitda_value(self, financial_metrics: Iterable[dict]):
+        """
+        Implied equity value via median EV/EBITDA multiple.
+        Accepts any iterable of metrics, latest first, so callers can pass chain(metrics, historical_metrics) instead of a concatenated list.
+        """
+        financial_metrics = iter(financial_metrics or ())
+        m0 = next(financial_metrics, None)
+        if not m0:
             return 0
-        if m0.get('enterprise_value_to_ebitda_ratio') == 0:
+        # Get median multiple from the positive historical ratios, filtered in one pass
+        ev_ebitda_ratios = np.fromiter(
+            (r for m in chain((m0,), financial_metrics) if (r := m.get('enterprise_value_to_ebitda_ratio')) and r > 0),
+            dtype=np.float64
+        )
+        if len(ev_ebitda_ratios) == 0:
             return 0
+        return self.calculate_implied_equity_value(m0, float(np.median(ev_ebitda_ratios)))
 
-        ebitda_now = m0.get('enterprise_value') / m0.get('enterprise_value_to_ebitda_ratio')
-        # Get median multiple from historical data
-        ev_ebitda_ratios = [m.get('enterprise_value_to_ebitda_ratio') for m in financial_metrics if m.get('enterprise_value_to_ebitda_ratio')]
-        if not ev_ebitda_ratios:
+    def calculate_implied_equity_value(self, m0: dict, median_multiple: float):
+        """Implied equity value of the latest metrics m0 at an already computed median EV/EBITDA multiple."""
+        enterprise_value = m0.get('enterprise_value')
+        ev_ebitda_ratio = m0.get('enterprise_value_to_ebitda_ratio')
+        if not (enterprise_value and ev_ebitda_ratio):
             return 0
-            
-        med_mult = median([r for r in ev_ebitda_ratios if r > 0])
-        ev_implied = med_mult * ebitda_now
-        net_debt = (m0.get('enterprise_value') or 0) - (m0.get('market_cap') or 0)
+
+        ebitda_now = enterprise_value / ev_ebitda_ratio
+        ev_implied = median_multiple * ebitda_now
+        net_debt = enterprise_value - (m0.get('market_cap') or 0)
         return max(ev_implied - net_debt, 0)
 
-    def analyze(self, metrics: list, historical_metrics: list) -> dict[str, any]:
-        """Analyze EV/EBITDA valuation."""
+    def analyze(self, metrics: list, historical_ratios: np.ndarray) -> dict[str, any]:
+        """Analyze EV/EBITDA valuation. historical_ratios is the EV/EBITDA column of the yearly metrics."""
         result = {"score": 0, "max_score": 10, "details": [], "indicators": {}}
         if not metrics or len(metrics) == 0:
             result["details"].append('Insufficient financial data for EV/EBITDA analysis')
@@ -56,22 +97,22 @@ class EVEBITDAAnalysis():
             result["details"].append('Insufficient EV/EBITDA data for analysis')
             return result
 
-        # Calculate EBITDA
-        ebitda = enterprise_value / ev_ebitda_ratio
-        
-        # Get historical EV/EBITDA ratios for comparison
-        historical_ratios = [m.get('enterprise_value_to_ebitda_ratio') for m in historical_metrics if m.get('enterprise_value_to_ebitda_ratio') and m.get('enterprise_value_to_ebitda_ratio') > 0]
+        # Get historical EV/EBITDA ratios for comparison, missing values are NaN and fail the filter
+        historical_ratios = historical_ratios[historical_ratios > 0]
         
-        if not historical_ratios:
+        if len(historical_ratios) == 0:
             result["details"].append('Insufficient historical data for EV/EBITDA analysis')
             return result
             
+        # Calculate EBITDA
+        ebitda = enterprise_value / ev_ebitda_ratio
+        
         # Calculate median and compare
-        median_ratio = median(historical_ratios)
+        median_ratio = float(np.median(historical_ratios))
         current_ratio = ev_ebitda_ratio
         
-        # Calculate implied equity value using median multiple
-        implied_equity_value = self.calculate_ev_ebitda_value(metrics + historical_metrics)
+        # Calculate implied equity value using the historical median multiple
+        implied_equity_value = self.calculate_implied_equity_value(m0, median_ratio)
         
         # Store indicators
         result["indicators"] = {
@@ -89,81 +130,39 @@ class EVEBITDAAnalysis():
         # Compare current ratio to median
         ratio_comparison = (current_ratio - median_ratio) / median_ratio
         
-        if ratio_comparison < -0.3:  # 30%+ below median
-            score += 3
-            reasoning.append(f"Significant undervaluation (EV/EBITDA: {current_ratio:.1f} vs median: {median_ratio:.1f})")
-        elif ratio_comparison < -0.15:  # 15%+ below median
-            score += 2
-            reasoning.append(f"Undervaluation (EV/EBITDA: {current_ratio:.1f} vs median: {median_ratio:.1f})")
-        elif ratio_comparison < -0.05:  # 5%+ below median
-            score += 1
-            reasoning.append(f"Slight undervaluation (EV/EBITDA: {current_ratio:.1f} vs median: {median_ratio:.1f})")
-        elif ratio_comparison < 0.05:  # Within 5% of median
-            reasoning.append(f"Fair valuation (EV/EBITDA: {current_ratio:.1f} vs median: {median_ratio:.1f})")
-        elif ratio_comparison < 0.15:  # 5-15% above median
-            score -= 1
-            reasoning.append(f"Slight overvaluation (EV/EBITDA: {current_ratio:.1f} vs median: {median_ratio:.1f})")
-        elif ratio_comparison < 0.30:  # 15-30% above median
-            score -= 2
-            reasoning.append(f"Overvaluation (EV/EBITDA: {current_ratio:.1f} vs median: {median_ratio:.1f})")
-        else:  # 30%+ above median
-            score -= 3
-            reasoning.append(f"Significant overvaluation (EV/EBITDA: {current_ratio:.1f} vs median: {median_ratio:.1f})")
+        delta, reason = _RATIO_COMPARISON_SIGNALS[bisect_right(_RATIO_COMPARISON_THRESHOLDS, ratio_comparison)]
+        score += delta
+        reasoning.append(reason.format(current=current_ratio, median=median_ratio))
         
         # Absolute level assessment
-        if current_ratio < 8:
-            reasoning.append(f"Attractive EV/EBITDA multiple ({current_ratio:.1f})")
-        elif current_ratio < 12:
-            reasoning.append(f"Reasonable EV/EBITDA multiple ({current_ratio:.1f})")
-        elif current_ratio < 15:
-            reasoning.append(f"Elevated EV/EBITDA multiple ({current_ratio:.1f})")
-        else:
-            reasoning.append(f"Rich EV/EBITDA multiple ({current_ratio:.1f})")
+        reasoning.append(_MULTIPLE_REASONS[bisect_right(_MULTIPLE_THRESHOLDS, current_ratio)].format(current=current_ratio))
         
         # Implied value vs market cap
         if market_cap and implied_equity_value > 0:
             value_gap = (implied_equity_value - market_cap) / market_cap
             result["indicators"]["implied_value_gap"] = value_gap
-            
-            if value_gap > 0.30:  # 30%+ above market cap
-                reasoning.append(f"Strong value indication (implied value: ${implied_equity_value:,.0f}M vs Market Cap: ${market_cap:,.0f}M)")
-            elif value_gap > 0.15:  # 15%+ above market cap
-                reasoning.append(f"Value indication (implied value: ${implied_equity_value:,.0f}M vs Market Cap: ${market_cap:,.0f}M)")
-            elif value_gap > 0.05:  # 5%+ above market cap
-                reasoning.append(f"Modest value indication (implied value: ${implied_equity_value:,.0f}M vs Market Cap: ${market_cap:,.0f}M)")
-            elif value_gap > -0.05:  # Within 5% of market cap
-                reasoning.append(f"Fair valuation (implied value: ${implied_equity_value:,.0f}M vs Market Cap: ${market_cap:,.0f}M)")
-            else:  # Below market cap
-                reasoning.append(f"Valuation concern (implied value: ${implied_equity_value:,.0f}M vs Market Cap: ${market_cap:,.0f}M)")
+            reasoning.append(_VALUE_GAP_REASONS[bisect_left(_VALUE_GAP_THRESHOLDS, value_gap)].format(
+                implied=implied_equity_value, mc=market_cap
+            ))
         
         result["score"] = max(0, min(10, score))  # Clamp between 0-10
         result["details"] = reasoning
         return result
 
+    def run(self, context: dict, metric_columns: dict = None) -> dict[str, any]:
+        """
+        Analyze context['metrics'] and context['historical_metrics'] and return the result tagged with its type and title.
+        metric_columns are the columns of those rows when the caller already built them.
+        """
+        historical_ratios = get_metric_column(context, 'historical_metrics', 'enterprise_value_to_ebitda_ratio', metric_columns)
+        analysis = self.analyze(context.get('metrics'), historical_ratios)
+        analysis['type'] = 'ev_ebitda_analysis'
+        analysis['title'] = f'EV/EBITDA Analysis'
+        return analysis
+
     def get_markdown(self, analysis:dict):
         """
         Convert analysis to markdown.
         """
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
-
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        historical_metrics = context.get('historical_metrics')
-        analysis = self.analyze(metrics, historical_metrics)
-        analysis['type'] = 'ev_ebitda_analysis'
-        analysis['title'] = f'EV/EBITDA Analysis'
-
-        analysis_data['ev_ebitda_analysis'] = analysis
-        ai_message = AIMessage(content=self.get_markdown(analysis))
-        return {
-            "context": context,
-            "messages": [
-                ai_message
-            ]
-        }
\ No newline at end of file
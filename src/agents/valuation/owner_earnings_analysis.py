@@ -1,12 +1,6 @@
-from common.agent_state import AgentState
-from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
-from langchain_core.runnables import RunnableConfig
 from typing import Dict, Any
-import time
 from common import markdown
-from langgraph.types import StreamWriter
-import math
 
 class OwnerEarningsAnalysis():
     def __init__(self, options: Dict[str, Any]):
@@ -165,30 +159,16 @@ class OwnerEarningsAnalysis():
         result["details"] = reasoning
         return result
 
+    def run(self, context: dict, metric_columns: dict = None) -> dict[str, any]:
+        """Analyze context['metrics'] and context['historical_metrics'] and return the result tagged with its type and title."""
+        analysis = self.analyze(context.get('metrics'), context.get('historical_metrics'))
+        analysis['type'] = 'owner_earnings_analysis'
+        analysis['title'] = f'Owner Earnings Analysis'
+        return analysis
+
     def get_markdown(self, analysis:dict):
         """
         Convert analysis to markdown.
         """
         markdown_content = markdown.analysis_data(analysis)
         return markdown_content
-
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        historical_metrics = context.get('historical_metrics')
-        analysis = self.analyze(metrics, historical_metrics)
-        analysis['type'] = 'owner_earnings_analysis'
-        analysis['title'] = f'Owner Earnings Analysis'
-
-        analysis_data['owner_earnings_analysis'] = analysis
-        ai_message = AIMessage(content=self.get_markdown(analysis))
-        return {
-            "context": context,
-            "messages": [
-                ai_message
-            ]
-        }
\ No newline at end of file
@@ -4,6 +4,8 @@ It defines the workflow graph, state, tools, nodes and edges.
 """
 
 from pkgutil import resolve_name
+import asyncio
+import json
 import time
 from common.agent_state import AgentState
 from common.util import get_dict_json
@@ -15,7 +17,7 @@ from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph import END, StateGraph
 from langgraph.prebuilt import ToolNode
 from langgraph.types import Command
-from llm.llm_model import ainvoke
+from llm.llm_model import ainvoke_cached
 
 from agents.warren_buffett.fundamental_analysis import FundamentalAnalysis
 from agents.warren_buffett.consistency_analysis import ConsistencyAnalysis
@@ -27,12 +29,26 @@ from agents.warren_buffett.management_quality_analysis import ManagementQualityA
 
 
 from nodes.next_step_suggestions import NextStepSuggestions
+from nodes.analysis_bundle import AnalysisBundle
 
 from nodes.ticker_search import TickerSearch
 from typing_extensions import Literal
 from common import markdown
 from common.dataset import Dataset
 
+# yearly fields read by the analyzers, kept in one place so every run asks the dataset (and its cache) for the same item set
+_METRIC_FIELDS = [
+    "return_on_equity", "debt_to_equity", "operating_margin", "current_ratio", "return_on_invested_capital", "asset_turnover",
+    "market_cap", "capital_expenditure", "depreciation_and_amortization", "net_income", "ordinary_shares_number",
+    "total_assets", "total_liabilities", "stockholders_equity", "dividends_and_other_cash_distributions",
+    "issuance_or_purchase_of_equity_shares", "gross_profit", "revenue", "free_cash_flow", "gross_margin",
+]
+# fields the analyzers read as float64 columns, built once per bundle run
+_COLUMN_FIELDS = [
+    "net_income", "return_on_equity", "operating_margin", "asset_turnover", "gross_margin",
+    "stockholders_equity", "ordinary_shares_number",
+]
+
 next_step_suggestions_node = NextStepSuggestions({})
 fundamental_analysis_node = FundamentalAnalysis({})
 consistency_analysis_node = ConsistencyAnalysis({})
@@ -41,80 +57,13 @@ book_value_growth_analysis_node = BookValueGrowthAnalysis({})
 intrinsic_value_analysis_node = IntrinsicValueAnalysis({})
 moat_analysis_node = MoatAnalysis({})
 management_quality_analysis_node = ManagementQualityAnalysis({})
+buffett_analysis_bundle_node = AnalysisBundle({'analyzers': [
+    fundamental_analysis_node, consistency_analysis_node, moat_analysis_node, pricing_power_analysis_node,
+    book_value_growth_analysis_node, management_quality_analysis_node, intrinsic_value_analysis_node
+], 'metric_fields': {'metrics': _COLUMN_FIELDS}})
 
-async def start_analysis(state: AgentState, config: RunnableConfig):
-    
-    end_date = state.get('action').get('parameters').get('end_date')
-    end_date = end_date if end_date else time.strftime("%Y-%m-%d")
 
-    context = state.get('context')
-    
-    ticker = context.get('current_task').get('ticker')
-    dataset_client = Dataset(config)
-    metrics = dataset_client.get_financial_items(ticker.get('symbol'), [
-        "return_on_equity","debt_to_equity","operating_margin","current_ratio","return_on_invested_capital","asset_turnover","market_cap",
-            "capital_expenditure",
-            "depreciation_and_amortization",
-            "net_income",
-            "ordinary_shares_number",
-            "total_assets",
-            "total_liabilities",
-            "stockholders_equity",
-            "dividends_and_other_cash_distributions",
-            "issuance_or_purchase_of_equity_shares",
-            "gross_profit",
-            "revenue",
-            "free_cash_flow",
-            "gross_margin",
-        ], end_date, period="yearly")
-    
-    context['metrics'] = metrics
-    return {
-        'context': context,
-        'messages':[AIMessage(content=markdown.to_h2('Analysis for '+ ticker.get('symbol')))]
-    }
-
-async def end_analysis(state: AgentState, config: RunnableConfig):
-    context = state.get('context')
-    ticker = context.get('current_task').get('ticker')
-    analysis_data = context.get('analysis_data')
-
-    # Calculate total score without circle of competence (LLM will handle that)
-    total_score = (
-        analysis_data.get('fundamental_analysis').get("score") + 
-        analysis_data.get('consistency_analysis').get("score") + 
-        analysis_data.get('moat_analysis').get("score") + 
-        analysis_data.get('management_quality_analysis').get("score") +
-        analysis_data.get('pricing_power_analysis').get("score") + 
-        analysis_data.get('book_value_growth_analysis').get("score")
-    )
-    
-    # Update max possible score calculation
-    max_possible_score = (
-        10 +  # fundamental_analysis (ROE, debt, margins, current ratio)
-        analysis_data.get('moat_analysis').get("max_score") + 
-        analysis_data.get('management_quality_analysis').get("max_score") +
-        5 +   # pricing_power (0-5)
-        5     # book_value_growth (0-5)
-    )
-
-    # Add margin of safety analysis if we have both intrinsic value and current price
-    margin_of_safety = None
-    intrinsic_value = analysis_data.get('intrinsic_value_analysis').get("intrinsic_value")
-    market_cap = None
-    if context.get("metrics") is not None and len(context.get("metrics")) > 0:
-        market_cap = context.get("metrics")[0].get("market_cap")
-    if intrinsic_value and market_cap:
-        margin_of_safety = (intrinsic_value - market_cap) / market_cap
-
-    analysis_data['total_score'] = total_score
-    analysis_data['max_possible_score'] = max_possible_score
-    analysis_data['margin_of_safety'] = margin_of_safety
-
-    messages = [
-            (
-                "system",
-                """You are Warren Buffett, the Oracle of Omaha. Analyze investment opportunities using my proven methodology developed over 60+ years of investing:
+_BUFFETT_SYSTEM_PROMPT = """You are Warren Buffett, the Oracle of Omaha. Analyze investment opportunities using my proven methodology developed over 60+ years of investing:
 
                 MY CORE PRINCIPLES:
                 1. Circle of Competence: "Risk comes from not knowing what you're doing." Only invest in businesses I thoroughly understand.
@@ -169,11 +118,9 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
                 - 10-29%: Poor business or significantly overvalued
 
                 Remember: I'd rather own a wonderful business at a fair price than a fair business at a wonderful price. And when in doubt, the answer is usually "no" - there's no penalty for missed opportunities, only for permanent capital loss.
-                """,
-            ),
-            (
-                "human",
-                f"""Analyze this investment opportunity for {ticker.get('symbol')} ({ticker.get('short_name')}):
+                """
+
+_BUFFETT_HUMAN_TEMPLATE = """Analyze this investment opportunity for {symbol} ({short_name}):
 
                 COMPREHENSIVE ANALYSIS DATA:
                 {analysis_data}
@@ -197,10 +144,88 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
                 7. How this compares to opportunities in your portfolio
 
                 Write as Warren Buffett would speak - plainly, with conviction, and with specific references to the data provided.
-                """,
-            ),
-        ]
-    response = await ainvoke(messages, config, analyzer=True)
+                """
+
+async def start_analysis(state: AgentState, config: RunnableConfig):
+    
+    end_date = state.get('action').get('parameters').get('end_date')
+    end_date = end_date if end_date else time.strftime("%Y-%m-%d")
+
+    context = state.get('context')
+    
+    ticker = context.get('current_task').get('ticker')
+    dataset_client = Dataset(config)
+    # the dataset client is synchronous, run the request in a worker thread so it does not block the event loop
+    metrics = await asyncio.to_thread(
+        dataset_client.get_financial_items, ticker.get('symbol'), _METRIC_FIELDS, end_date, period="yearly"
+    )
+    
+    context['metrics'] = metrics
+    return {
+        'context': context,
+        'messages':[AIMessage(content=markdown.to_h2('Analysis for '+ ticker.get('symbol')))]
+    }
+
+async def end_analysis(state: AgentState, config: RunnableConfig):
+    context = state.get('context')
+    ticker = context.get('current_task').get('ticker')
+
+    # Without yearly metrics every analysis only reports missing data, there is nothing to ground a verdict on
+    if not context.get('metrics'):
+        return {
+            "messages": AIMessage(content=f"Insufficient financial data to analyze {ticker.get('symbol')}."),
+            "action": None,
+        }
+    analysis_data = context.get('analysis_data')
+
+    # Calculate total score without circle of competence (LLM will handle that)
+    total_score = (
+        analysis_data.get('fundamental_analysis').get("score") + 
+        analysis_data.get('consistency_analysis').get("score") + 
+        analysis_data.get('moat_analysis').get("score") + 
+        analysis_data.get('management_quality_analysis').get("score") +
+        analysis_data.get('pricing_power_analysis').get("score") + 
+        analysis_data.get('book_value_growth_analysis').get("score")
+    )
+    
+    # Update max possible score calculation
+    max_possible_score = (
+        10 +  # fundamental_analysis (ROE, debt, margins, current ratio)
+        analysis_data.get('moat_analysis').get("max_score") + 
+        analysis_data.get('management_quality_analysis').get("max_score") +
+        5 +   # pricing_power (0-5)
+        5     # book_value_growth (0-5)
+    )
+
+    # Add margin of safety analysis if we have both intrinsic value and current price
+    margin_of_safety = None
+    intrinsic_value = analysis_data.get('intrinsic_value_analysis').get("intrinsic_value")
+    market_cap = None
+    if context.get("metrics") is not None and len(context.get("metrics")) > 0:
+        market_cap = context.get("metrics")[0].get("market_cap")
+    if intrinsic_value and market_cap:
+        margin_of_safety = (intrinsic_value - market_cap) / market_cap
+
+    analysis_data['total_score'] = total_score
+    analysis_data['max_possible_score'] = max_possible_score
+    analysis_data['margin_of_safety'] = margin_of_safety
+
+    # Send compact JSON without the display-only fields (type, title and the markdown block id), the analysis name already keys each entry
+    prompt_data = {
+        name: {key: value for key, value in analysis.items() if key not in ('type', 'title', '_id_')} if isinstance(analysis, dict) else analysis
+        for name, analysis in analysis_data.items()
+    }
+
+    messages = [
+        ("system", _BUFFETT_SYSTEM_PROMPT),
+        ("human", _BUFFETT_HUMAN_TEMPLATE.format(
+            symbol=ticker.get('symbol'), short_name=ticker.get('short_name'),
+            analysis_data=json.dumps(prompt_data, separators=(",", ":"), default=str)
+        )),
+    ]
+    # stream=True (the ainvoke default) already emits tokens to the messages stream as they are generated,
+    # a prompt identical to a recent one reuses that earlier response
+    response = await ainvoke_cached(messages, config, analyzer=True)
     
     return {
         "messages": response,
@@ -213,26 +238,14 @@ async def end_analysis(state: AgentState, config: RunnableConfig):
 workflow = StateGraph(AgentState)
 workflow.add_node("start_analysis", start_analysis)
 
-workflow.add_node("fundamental_analysis", fundamental_analysis_node)
-workflow.add_node("consistency_analysis", consistency_analysis_node)
-workflow.add_node("moat_analysis", moat_analysis_node)
-workflow.add_node("pricing_power_analysis", pricing_power_analysis_node)
-workflow.add_node("book_value_growth_analysis", book_value_growth_analysis_node)
-workflow.add_node("management_quality_analysis", management_quality_analysis_node)
-workflow.add_node("intrinsic_value_analysis", intrinsic_value_analysis_node)
+workflow.add_node("buffett_analysis_bundle", buffett_analysis_bundle_node)
 
 workflow.add_node("end_analysis", end_analysis)
 
-workflow.add_edge("start_analysis", "fundamental_analysis")
-workflow.add_edge("fundamental_analysis", "consistency_analysis")
-workflow.add_edge("consistency_analysis", "moat_analysis")
-workflow.add_edge("moat_analysis", "pricing_power_analysis")
-workflow.add_edge("pricing_power_analysis", "book_value_growth_analysis")
-workflow.add_edge("book_value_growth_analysis", "management_quality_analysis")
-workflow.add_edge("management_quality_analysis", "intrinsic_value_analysis")
-workflow.add_edge("intrinsic_value_analysis", "end_analysis")
+workflow.add_edge("start_analysis", "buffett_analysis_bundle")
+workflow.add_edge("buffett_analysis_bundle", "end_analysis")
 
 workflow.set_entry_point("start_analysis")
 workflow.set_finish_point("end_analysis")
-# Compile the workflow graph
+# Compile the workflow graph once at import, the nodes hold no per-run state so one graph serves concurrent runs
 agent = workflow.compile()
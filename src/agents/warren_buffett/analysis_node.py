@@ -0,0 +1,54 @@
+from common.agent_state import AgentState
+from langchain.schema import AIMessage
+from langchain_core.runnables import RunnableConfig
+from typing import Dict, Any
+from common import markdown
+from langgraph.types import StreamWriter
+
+
+class BuffettAnalysisNode():
+    """
+    Shared node flow of the Buffett analyzers. Subclasses set analysis_type and analysis_title and implement
+    analyze(), which builds its result with new_result(); the default analyze_context passes context['metrics'],
+    analyzers that read metric columns override it and take them from the metric_columns built by the caller.
+    """
+    analysis_type: str = None
+    analysis_title: str = None
+
+    def __init__(self, options: Dict[str, Any]):
+        self.options = options
+
+    def new_result(self, **fields) -> dict[str, any]:
+        """Analysis result dict, created already tagged with this analyzer's type and title."""
+        return {"type": self.analysis_type, "title": self.analysis_title, **fields}
+
+    def analyze_context(self, context: dict, metric_columns: dict = None) -> dict[str, any]:
+        return self.analyze(context.get('metrics'))
+
+    def run(self, context: dict, metric_columns: dict = None) -> dict[str, any]:
+        """Analyze the context and return the result, analyze() builds it through new_result."""
+        return self.analyze_context(context, metric_columns)
+
+    def get_markdown(self, analysis:dict):
+        """
+        Convert analysis to markdown.
+        """
+        markdown_content = markdown.analysis_data(analysis)
+        return markdown_content
+
+    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        context = state.get('context')
+        analysis_data = context.get('analysis_data')
+        if analysis_data is None:
+            analysis_data = {}
+            context['analysis_data'] = analysis_data
+        analysis = self.run(context)
+
+        analysis_data[self.analysis_type] = analysis
+        ai_message = AIMessage(content=self.get_markdown(analysis))
+        return {
+            "context": context,
+            "messages": [
+                ai_message
+            ]
+        }
@@ -1,36 +1,48 @@
-from common.agent_state import AgentState
-from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
-from langchain_core.runnables import RunnableConfig
-from typing import Dict, Any
+from agents.warren_buffett.analysis_node import BuffettAnalysisNode
 
-import time
-from common import markdown
-from langgraph.types import StreamWriter
+from common.metric_columns import get_metric_column
+import numpy as np
+from bisect import bisect_left, bisect_right
 
+# Share of growing periods buckets from bisect_right, each threshold is an inclusive "at least":
+# < 40%, [40%, 60%), [60%, 80%), >= 80%
+_GROWTH_CONSISTENCY_THRESHOLDS = (0.4, 0.6, 0.8)
+# (score, reason) indexed by growth consistency bucket
+_GROWTH_CONSISTENCY_SIGNALS = (
+    (0, "Inconsistent book value per share growth"),
+    (1, "Moderate book value per share growth"),
+    (2, "Good book value per share growth pattern"),
+    (3, "Consistent book value per share growth (Buffett's favorite metric)"),
+)
 
+# Book value CAGR buckets from bisect_left, strict "greater than": <= 10%, (10%, 15%], > 15%
+_CAGR_THRESHOLDS = (0.1, 0.15)
+# (score, reason) indexed by CAGR bucket
+_CAGR_SIGNALS = (
+    (0, "Book value CAGR: {cagr:.1%}"),
+    (1, "Good book value CAGR: {cagr:.1%}"),
+    (2, "Excellent book value CAGR: {cagr:.1%}"),
+)
 
-class BookValueGrowthAnalysis():
-    def __init__(self, options: Dict[str, Any]):
-        self.options = options
 
-    def _calculate_book_value_cagr(self,book_values: list) -> tuple[int, str]:
+class BookValueGrowthAnalysis(BuffettAnalysisNode):
+    analysis_type = 'book_value_growth_analysis'
+    analysis_title = 'Book value growth analysis'
+
+    def _calculate_book_value_cagr(self,book_values: np.ndarray) -> tuple[int, str]:
         """Helper function to safely calculate book value CAGR and return score + reasoning."""
         if len(book_values) < 2:
             return 0, "Insufficient data for CAGR calculation"
         
-        oldest_bv, latest_bv = book_values[-1], book_values[0]
+        oldest_bv, latest_bv = float(book_values[-1]), float(book_values[0])
         years = len(book_values) - 1
         
         # Handle different scenarios
         if oldest_bv > 0 and latest_bv > 0:
             cagr = ((latest_bv / oldest_bv) ** (1/years)) - 1
-            if cagr > 0.15:
-                return 2, f"Excellent book value CAGR: {cagr:.1%}"
-            elif cagr > 0.1:
-                return 1, f"Good book value CAGR: {cagr:.1%}"
-            else:
-                return 0, f"Book value CAGR: {cagr:.1%}"
+            score, reason = _CAGR_SIGNALS[bisect_left(_CAGR_THRESHOLDS, cagr)]
+            return score, reason.format(cagr=cagr)
         elif oldest_bv < 0 < latest_bv:
             return 3, "Excellent: Company improved from negative to positive book value"
         elif oldest_bv > 0 > latest_bv:
@@ -39,20 +51,19 @@ class BookValueGrowthAnalysis():
             return 0, "Unable to calculate meaningful book value CAGR due to negative values"
 
     
-    def analyze(self, financial_line_items: list) -> dict[str, any]:
-        """Analyze book value per share growth - a key Buffett metric."""
-        result = {"score": 0, "max_score": 6, "details": []}
+    def analyze(self, financial_line_items: list, stockholders_equity: np.ndarray, shares: np.ndarray) -> dict[str, any]:
+        """
+        Analyze book value per share growth - a key Buffett metric.
+        stockholders_equity and shares are the stockholders_equity and ordinary_shares_number columns of financial_line_items.
+        """
+        result = self.new_result(score=0, max_score=6, details=[])
         if len(financial_line_items) < 3:
             result["details"].append("Insufficient data for book value analysis")
             return result
         
-        # Extract book values per share
-        book_values = [
-            item.get('stockholders_equity') / item.get('ordinary_shares_number')
-            for item in financial_line_items
-            if hasattr(item, 'stockholders_equity') and hasattr(item, 'ordinary_shares_number')
-            and item.get('stockholders_equity') and item.get('ordinary_shares_number')
-        ]
+        # Extract book values per share from the periods reporting both a non-zero equity and share count
+        valid = ~np.isnan(stockholders_equity) & (stockholders_equity != 0) & ~np.isnan(shares) & (shares != 0)
+        book_values = stockholders_equity[valid] / shares[valid]
         
         if len(book_values) < 3:
             result["details"].append("Insufficient book value data for growth analysis")
@@ -62,21 +73,13 @@ class BookValueGrowthAnalysis():
         reasoning = []
         
         # Analyze growth consistency
-        growth_periods = sum(1 for i in range(len(book_values) - 1) if book_values[i] > book_values[i + 1])
+        growth_periods = int(np.count_nonzero(book_values[:-1] > book_values[1:]))
         growth_rate = growth_periods / (len(book_values) - 1)
         
         # Score based on consistency
-        if growth_rate >= 0.8:
-            score += 3
-            reasoning.append("Consistent book value per share growth (Buffett's favorite metric)")
-        elif growth_rate >= 0.6:
-            score += 2
-            reasoning.append("Good book value per share growth pattern")
-        elif growth_rate >= 0.4:
-            score += 1
-            reasoning.append("Moderate book value per share growth")
-        else:
-            reasoning.append("Inconsistent book value per share growth")
+        consistency_score, consistency_reason = _GROWTH_CONSISTENCY_SIGNALS[bisect_right(_GROWTH_CONSISTENCY_THRESHOLDS, growth_rate)]
+        score += consistency_score
+        reasoning.append(consistency_reason)
         
         # Calculate and score CAGR
         cagr_score, cagr_reason = self._calculate_book_value_cagr(book_values)
@@ -87,29 +90,10 @@ class BookValueGrowthAnalysis():
         result["details"] = reasoning
         return result
 
-    def get_markdown(self, analysis:dict):
-        """
-        Convert analysis to markdown.
-        """
-        markdown_content = markdown.analysis_data(analysis)
-        return markdown_content
-
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
-        analysis['type'] = 'book_value_growth_analysis'
-        analysis['title'] = 'Book value growth analysis'
-
-        analysis_data['book_value_growth_analysis'] = analysis
-        ai_message = AIMessage(content=self.get_markdown(analysis))
-        return {
-            "context": context,
-            "messages": [
-                ai_message
-            ]
-        }
\ No newline at end of file
+    def analyze_context(self, context: dict, metric_columns: dict = None) -> dict[str, any]:
+        """Analyze context['metrics'] and its metric columns."""
+        return self.analyze(
+            context.get('metrics'),
+            get_metric_column(context, 'metrics', 'stockholders_equity', metric_columns),
+            get_metric_column(context, 'metrics', 'ordinary_shares_number', metric_columns)
+        )
@@ -1,22 +1,18 @@
-from common.agent_state import AgentState
-from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
-from langchain_core.runnables import RunnableConfig
-from typing import Dict, Any
+from agents.warren_buffett.analysis_node import BuffettAnalysisNode
 
-import time
-from common import markdown
-from langgraph.types import StreamWriter
+from common.metric_columns import get_metric_column
+import numpy as np
 
 
 
-class ConsistencyAnalysis():
-    def __init__(self, options: Dict[str, Any]):
-        self.options = options
+class ConsistencyAnalysis(BuffettAnalysisNode):
+    analysis_type = 'consistency_analysis'
+    analysis_title = 'Consistency analysis'
 
-    def analyze(self, financial_line_items: list) -> dict[str, any]:
-        """Analyze earnings consistency and growth."""
-        result = {"score": 0, "max_score": 3, "details": []}
+    def analyze(self, financial_line_items: list, net_income: np.ndarray) -> dict[str, any]:
+        """Analyze earnings consistency and growth. net_income is the net income column of financial_line_items."""
+        result = self.new_result(score=0, max_score=3, details=[])
         if len(financial_line_items) < 4:  # Need at least 4 periods for trend analysis
             result["details"].append("Insufficient historical data")
             return result
@@ -25,10 +21,12 @@ class ConsistencyAnalysis():
         reasoning = []
 
         # Check earnings growth trend
-        earnings_values = [item.get('net_income') for item in financial_line_items if item.get('net_income')]
-        if len(earnings_values) >= 4:
+        # only missing (NaN) earnings are skipped, a reported zero is a real data point of the trend
+        earnings_values = net_income[~np.isnan(net_income)]
+        periods = len(earnings_values)
+        if periods >= 4:
             # Simple check: is each period's earnings bigger than the next?
-            earnings_growth = all(earnings_values[i] > earnings_values[i + 1] for i in range(len(earnings_values) - 1))
+            earnings_growth = bool(np.all(earnings_values[:-1] > earnings_values[1:]))
 
             if earnings_growth:
                 score += 3
@@ -37,9 +35,9 @@ class ConsistencyAnalysis():
                 reasoning.append("Inconsistent earnings growth pattern")
 
             # Calculate total growth rate from oldest to latest
-            if len(earnings_values) >= 2 and earnings_values[-1] != 0:
-                growth_rate = (earnings_values[0] - earnings_values[-1]) / abs(earnings_values[-1])
-                reasoning.append(f"Total earnings growth of {growth_rate:.1%} over past {len(earnings_values)} periods")
+            if earnings_values[-1] != 0:
+                growth_rate = float((earnings_values[0] - earnings_values[-1]) / abs(earnings_values[-1]))
+                reasoning.append(f"Total earnings growth of {growth_rate:.1%} over past {periods} periods")
         else:
             reasoning.append("Insufficient earnings data for trend analysis")
 
@@ -47,29 +45,6 @@ class ConsistencyAnalysis():
         result["details"] = reasoning
         return result
 
-    def get_markdown(self, analysis:dict):
-        """
-        Convert analysis to markdown.
-        """
-        markdown_content = markdown.analysis_data(analysis)
-        return markdown_content
-
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
-        analysis['type'] = 'consistency_analysis'
-        analysis['title'] = 'Consistency analysis'
-
-        analysis_data['consistency_analysis'] = analysis
-        ai_message = AIMessage(content=self.get_markdown(analysis))
-        return {
-            "context": context,
-            "messages": [
-                ai_message
-            ]
-        }
\ No newline at end of file
+    def analyze_context(self, context: dict, metric_columns: dict = None) -> dict[str, any]:
+        """Analyze context['metrics'] and its metric columns."""
+        return self.analyze(context.get('metrics'), get_metric_column(context, 'metrics', 'net_income', metric_columns))
@@ -1,23 +1,18 @@
-from common.agent_state import AgentState
-from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
-from langchain_core.runnables import RunnableConfig
-from typing import Dict, Any
+from agents.warren_buffett.analysis_node import BuffettAnalysisNode
 
 import time
-from common import markdown
-from langgraph.types import StreamWriter
 
 
 
-class FundamentalAnalysis():
-    def __init__(self, options: Dict[str, Any]):
-        self.options = options
+class FundamentalAnalysis(BuffettAnalysisNode):
+    analysis_type = 'fundamental_analysis'
+    analysis_title = 'Fundamental analysis'
 
     
     def analyze(self, metrics: list) -> dict[str, any]:
         """Analyze company fundamentals based on Buffett's criteria."""
-        result = {"score": 0, "max_score": 7, "details": []}
+        result = self.new_result(score=0, max_score=7, details=[])
         if not metrics:
             result["details"].append('No metrics available')
             return result
@@ -27,70 +22,49 @@ class FundamentalAnalysis():
         score = 0
         reasoning = []
 
+        # Bind each metric once, a reported 0 is a real value and only None means missing
+        roe = latest_metrics.get('return_on_equity')
+        debt_to_equity = latest_metrics.get('debt_to_equity')
+        operating_margin = latest_metrics.get('operating_margin')
+        current_ratio = latest_metrics.get('current_ratio')
+
         # Check ROE (Return on Equity)
-        if latest_metrics.get('return_on_equity') and latest_metrics['return_on_equity'] > 0.15:  # 15% ROE threshold
+        if roe is None:
+            reasoning.append(f"ROE data not available")
+        elif roe > 0.15:  # 15% ROE threshold
             score += 2
-            reasoning.append(f"Strong ROE of {latest_metrics['return_on_equity']:.1%}")
-        elif latest_metrics.get('return_on_equity'):
-            reasoning.append(f"Weak ROE of {latest_metrics['return_on_equity']:.1%}")
+            reasoning.append(f"Strong ROE of {roe:.1%}")
         else:
-            reasoning.append(f"ROE data not available")
+            reasoning.append(f"Weak ROE of {roe:.1%}")
 
         # Check Debt to Equity
-        if latest_metrics.get('debt_to_equity') and latest_metrics['debt_to_equity'] < 0.5:
+        if debt_to_equity is None:
+            reasoning.append(f"Debt to equity data not available")
+        elif debt_to_equity < 0.5:
             score += 2
             reasoning.append(f"Conservative debt levels")
-        elif latest_metrics.get('debt_to_equity'):
-            reasoning.append(f"High debt to equity ratio of {latest_metrics['debt_to_equity']:.1f}")
         else:
-            reasoning.append(f"Debt to equity data not available")
+            reasoning.append(f"High debt to equity ratio of {debt_to_equity:.1f}")
 
         # Check Operating Margin
-        if latest_metrics.get('operating_margin') and latest_metrics['operating_margin'] > 0.15:
+        if operating_margin is None:
+            reasoning.append(f"Operating margin data not available")
+        elif operating_margin > 0.15:
             score += 2
             reasoning.append(f"Strong operating margins")
-        elif latest_metrics.get('operating_margin'):
-            reasoning.append(f"Weak operating margin of {latest_metrics['operating_margin']:.1%}")
         else:
-            reasoning.append(f"Operating margin data not available")
+            reasoning.append(f"Weak operating margin of {operating_margin:.1%}")
 
         # Check Current Ratio
-        if latest_metrics.get('current_ratio') and latest_metrics['current_ratio'] > 1.5:
+        if current_ratio is None:
+            reasoning.append(f"Current ratio data not available")
+        elif current_ratio > 1.5:
             score += 1
             reasoning.append(f"Good liquidity position")
-        elif latest_metrics.get('current_ratio'):
-            reasoning.append(f"Weak liquidity with current ratio of {latest_metrics['current_ratio']:.1f}")
         else:
-            reasoning.append(f"Current ratio data not available")
+            reasoning.append(f"Weak liquidity with current ratio of {current_ratio:.1f}")
         # types.SimpleNamespace to json
 
         result["score"] = score
         result["details"] = reasoning
         return result
-
-    def get_markdown(self, analysis:dict):
-        """
-        Convert analysis to markdown.
-        """
-        markdown_content = markdown.analysis_data(analysis)
-        return markdown_content
-
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
-        analysis['type'] = 'fundamental_analysis'
-        analysis['title'] = f'Fundamental analysis'
-
-        analysis_data['fundamental_analysis'] = analysis
-        ai_message = AIMessage(content=self.get_markdown(analysis))
-        return {
-            "context": context,
-            "messages": [
-                ai_message
-            ]
-        }
\ No newline at end of file
@@ -1,18 +1,30 @@
-from common.agent_state import AgentState
-from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
-from langchain_core.runnables import RunnableConfig
-from typing import Dict, Any
+from agents.warren_buffett.analysis_node import BuffettAnalysisNode
+from common.metric_columns import get_metric_column
 
 import time
-from common import markdown
-from langgraph.types import StreamWriter
+from itertools import islice
+import numpy as np
 
 
+def _growing_earnings_pv(earnings: float, growth_rate: float, discount_rate: float, years: int) -> float:
+    """
+    Present value of earnings * (1 + growth_rate) ** year / (1 + discount_rate) ** year summed over years 1..years.
+    Growth and discount are constant, so the sum is a geometric series with a closed form.
+    """
+    ratio = (1 + growth_rate) / (1 + discount_rate)
+    if ratio == 1:
+        return earnings * years
+    return earnings * ratio * (1 - ratio ** years) / (1 - ratio)
 
-class IntrinsicValueAnalysis():
-    def __init__(self, options: Dict[str, Any]):
-        self.options = options
+
+class IntrinsicValueAnalysis(BuffettAnalysisNode):
+    analysis_type = 'intrinsic_value_analysis'
+    analysis_title = 'Intrinsic value analysis'
+
+    def analyze_context(self, context: dict, metric_columns: dict = None) -> dict[str, any]:
+        """Analyze context['metrics'] and its net income column."""
+        return self.analyze(context.get('metrics'), get_metric_column(context, 'metrics', 'net_income', metric_columns))
 
     def estimate_maintenance_capex(self, financial_line_items: list) -> float:
         """
@@ -22,24 +34,23 @@ class IntrinsicValueAnalysis():
         if not financial_line_items:
             return 0
         
-        # Approach 1: Historical average as % of revenue
-        capex_ratios = []
-        depreciation_values = []
+        # Approach 1: Historical average as % of revenue, accumulated in a single pass
+        capex_ratio_sum = 0
+        capex_ratio_count = 0
         
-        for item in financial_line_items[:5]:  # Last 5 periods
-            if item.get('capital_expenditure') and item.get('revenue'):
-                if item.get('capital_expenditure') and item.get('revenue') and item.get('revenue') > 0:
-                    capex_ratio = abs(item.get('capital_expenditure')) / item.get('revenue')
-                    capex_ratios.append(capex_ratio)
-            
-            if item.get('depreciation_and_amortization') and item.get('depreciation_and_amortization'):
-                depreciation_values.append(item.get('depreciation_and_amortization'))
+        for item in islice(financial_line_items, 5):  # Last 5 periods
+            capex = item.get('capital_expenditure')
+            revenue = item.get('revenue')
+            if capex and revenue and revenue > 0:
+                capex_ratio_sum += abs(capex) / revenue
+                capex_ratio_count += 1
         
+        latest = financial_line_items[0]
         # Approach 2: Percentage of depreciation (typically 80-120% for maintenance)
-        latest_depreciation = financial_line_items[0].get('depreciation_and_amortization') if financial_line_items[0].get('depreciation_and_amortization') else 0
+        latest_depreciation = latest.get('depreciation_and_amortization') or 0
         
         # Approach 3: Industry-specific heuristics
-        latest_capex = abs(financial_line_items[0].get('capital_expenditure')) if financial_line_items[0].get('capital_expenditure') else 0
+        latest_capex = abs(latest.get('capital_expenditure') or 0)
         
         # Conservative estimate: Use the higher of:
         # 1. 85% of total capex (assuming 15% is growth capex)
@@ -50,14 +61,13 @@ class IntrinsicValueAnalysis():
         method_2 = latest_depreciation  # 100% of depreciation
         
         # If we have historical data, use average capex ratio
-        if len(capex_ratios) >= 3:
-            avg_capex_ratio = sum(capex_ratios) / len(capex_ratios)
-            latest_revenue = financial_line_items[0].get('revenue') if financial_line_items[0].get('revenue') else 0
+        if capex_ratio_count >= 3:
+            avg_capex_ratio = capex_ratio_sum / capex_ratio_count
+            latest_revenue = latest.get('revenue') or 0
             method_3 = avg_capex_ratio * latest_revenue if latest_revenue else 0
             
             # Use the median of the three approaches for conservatism
-            estimates = sorted([method_1, method_2, method_3])
-            return estimates[1]  # Median
+            return max(min(method_1, method_2), min(max(method_1, method_2), method_3))
         else:
             # Use the higher of method 1 and 2
             return max(method_1, method_2)
@@ -80,7 +90,7 @@ class IntrinsicValueAnalysis():
         depreciation = latest.get('depreciation_and_amortization')
         capex = latest.get('capital_expenditure')
 
-        if not all([net_income is not None, depreciation is not None, capex is not None]):
+        if net_income is None or depreciation is None or capex is None:
             missing = []
             if net_income is None: missing.append("net income")
             if depreciation is None: missing.append("depreciation")
@@ -101,13 +111,14 @@ class IntrinsicValueAnalysis():
                 current_assets_previous = previous.get('current_assets')
                 current_liab_previous = previous.get('current_liabilities')
                 
-                if all([current_assets_current, current_liab_current, current_assets_previous, current_liab_previous]):
+                # a zero balance is a real value, only missing ones skip the adjustment
+                if None not in (current_assets_current, current_liab_current, current_assets_previous, current_liab_previous):
                     wc_current = current_assets_current - current_liab_current
                     wc_previous = current_assets_previous - current_liab_previous
                     working_capital_change = wc_current - wc_previous
                     details.append(f"Working capital change: ${working_capital_change:,.0f}")
-            except:
-                pass  # Skip working capital adjustment if data unavailable
+            except TypeError:
+                pass  # Skip working capital adjustment if the balances are not numeric
 
         # Calculate owner earnings
         owner_earnings = net_income + depreciation - maintenance_capex - working_capital_change
@@ -138,12 +149,13 @@ class IntrinsicValueAnalysis():
             "details": details,
         }
 
-    def analyze(self, financial_line_items: list) -> dict[str, any]:
+    def analyze(self, financial_line_items: list, net_income: np.ndarray) -> dict[str, any]:
         """
         Calculate intrinsic value using enhanced DCF with owner earnings.
         Uses more sophisticated assumptions and conservative approach like Buffett.
+        net_income is the net income column of financial_line_items, NaN where missing.
         """
-        result = {"intrinsic_value": None, "score": 0, "max_score": 6, "details": []}
+        result = self.new_result(intrinsic_value=None, score=0, max_score=6, details=[])
         if not financial_line_items or len(financial_line_items) < 3:
             result["details"].append("Insufficient data for reliable valuation")
             return result
@@ -166,19 +178,21 @@ class IntrinsicValueAnalysis():
         details = []
         
         # Estimate growth rate based on historical performance (more conservative)
-        historical_earnings = []
-        for item in financial_line_items[:5]:  # Last 5 years
-            if hasattr(item, 'net_income') and item.net_income:
-                historical_earnings.append(item.net_income)
+        recent_earnings = net_income[:5]  # Last 5 years
+        historical_earnings = recent_earnings[~np.isnan(recent_earnings) & (recent_earnings != 0)]
         
         # Calculate historical growth rate
         if len(historical_earnings) >= 3:
-            oldest_earnings = historical_earnings[-1]
-            latest_earnings = historical_earnings[0]
+            oldest_earnings = float(historical_earnings[-1])
+            latest_earnings = float(historical_earnings[0])
             years = len(historical_earnings) - 1
             
             if oldest_earnings > 0:
-                historical_growth = ((latest_earnings / oldest_earnings) ** (1/years)) - 1
+                if latest_earnings > 0:
+                    historical_growth = ((latest_earnings / oldest_earnings) ** (1/years)) - 1
+                else:
+                    # Earnings turned negative, there is no real growth rate, take the floor below
+                    historical_growth = -1
                 # Conservative adjustment - cap growth and apply haircut
                 historical_growth = max(-0.05, min(historical_growth, 0.15))  # Cap between -5% and 15%
                 conservative_growth = historical_growth * 0.7  # Apply 30% haircut for conservatism
@@ -207,19 +221,14 @@ class IntrinsicValueAnalysis():
         details.append(f"Using three-stage DCF: Stage 1 ({stage1_growth:.1%}, {stage1_years}y), Stage 2 ({stage2_growth:.1%}, {stage2_years}y), Terminal ({terminal_growth:.1%})")
         
         # Stage 1: Higher growth
-        stage1_pv = 0
-        for year in range(1, stage1_years + 1):
-            future_earnings = owner_earnings * (1 + stage1_growth) ** year
-            pv = future_earnings / (1 + discount_rate) ** year
-            stage1_pv += pv
+        stage1_pv = _growing_earnings_pv(owner_earnings, stage1_growth, discount_rate, stage1_years)
         
-        # Stage 2: Transition growth
-        stage2_pv = 0
+        # Stage 2: Transition growth, starting from the stage 1 exit earnings and discounted back past stage 1
         stage1_final_earnings = owner_earnings * (1 + stage1_growth) ** stage1_years
-        for year in range(1, stage2_years + 1):
-            future_earnings = stage1_final_earnings * (1 + stage2_growth) ** year
-            pv = future_earnings / (1 + discount_rate) ** (stage1_years + year)
-            stage2_pv += pv
+        stage2_pv = (
+            _growing_earnings_pv(stage1_final_earnings, stage2_growth, discount_rate, stage2_years)
+            / (1 + discount_rate) ** stage1_years
+        )
         
         # Terminal value using Gordon Growth Model
         final_earnings = stage1_final_earnings * (1 + stage2_growth) ** stage2_years
@@ -249,12 +258,12 @@ class IntrinsicValueAnalysis():
         elif intrinsic_value > 0:
             score = 3
 
-        return {
-            "intrinsic_value": conservative_intrinsic_value,
-            "raw_intrinsic_value": intrinsic_value,
-            "owner_earnings": owner_earnings,
-            "score": score, "max_score": result["max_score"],
-            "assumptions": {
+        return self.new_result(
+            intrinsic_value=conservative_intrinsic_value,
+            raw_intrinsic_value=intrinsic_value,
+            owner_earnings=owner_earnings,
+            score=score, max_score=result["max_score"],
+            assumptions={
                 "stage1_growth": stage1_growth,
                 "stage2_growth": stage2_growth,
                 "terminal_growth": terminal_growth,
@@ -263,32 +272,5 @@ class IntrinsicValueAnalysis():
                 "stage2_years": stage2_years,
                 "historical_growth": conservative_growth if 'conservative_growth' in locals() else None,
             },
-            "details": details,
-        }
-
-    def get_markdown(self, analysis:dict):
-        """
-        Convert analysis to markdown.
-        """
-        markdown_content = markdown.analysis_data(analysis)
-        return markdown_content
-
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
-        analysis['type'] = 'intrinsic_value_analysis'
-        analysis['title'] = 'Intrinsic value analysis'
-
-        analysis_data['intrinsic_value_analysis'] = analysis
-        ai_message = AIMessage(content=self.get_markdown(analysis))
-        return {
-            "context": context,
-            "messages": [
-                ai_message
-            ]
-        }
\ No newline at end of file
+            details=details,
+        )
@@ -1,26 +1,23 @@
-from common.agent_state import AgentState
-from langchain.schema import AIMessage
 from langchain_core.callbacks import dispatch_custom_event
-from langchain_core.runnables import RunnableConfig
-from typing import Dict, Any
+from agents.warren_buffett.analysis_node import BuffettAnalysisNode
 
-import time
-from common import markdown
-from langgraph.types import StreamWriter
+from common.metric_columns import get_metric_column
+import numpy as np
 
 
 
-class PricingPowerAnalysis():
-    def __init__(self, options: Dict[str, Any]):
-        self.options = options
+class PricingPowerAnalysis(BuffettAnalysisNode):
+    analysis_type = 'pricing_power_analysis'
+    analysis_title = 'Pricing power analysis'
 
     
-    def analyze(self, financial_line_items: list) -> dict[str, any]:
+    def analyze(self, financial_line_items: list, gross_margin: np.ndarray) -> dict[str, any]:
         """
         Analyze pricing power - Buffett's key indicator of a business moat.
         Looks at ability to raise prices without losing customers (margin expansion during inflation).
+        gross_margin is the gross margin column of financial_line_items, NaN where missing.
         """
-        result = {"score": 0, "max_score": 5, "details": []}
+        result = self.new_result(score=0, max_score=5, details=[])
         if not financial_line_items:
             result["details"].append("Insufficient data for pricing power analysis")
             return result
@@ -29,15 +26,12 @@ class PricingPowerAnalysis():
         reasoning = []
         
         # Check gross margin trends (ability to maintain/expand margins)
-        gross_margins = []
-        for item in financial_line_items:
-            if item.get('gross_margin') is not None:
-                gross_margins.append(item.get('gross_margin'))
+        gross_margins = gross_margin[~np.isnan(gross_margin)]
         
         if len(gross_margins) >= 3:
-            # Check margin stability/improvement
-            recent_avg = sum(gross_margins[:2]) / 2 if len(gross_margins) >= 2 else gross_margins[0]
-            older_avg = sum(gross_margins[-2:]) / 2 if len(gross_margins) >= 2 else gross_margins[-1]
+            # Check margin stability/improvement of the latest two periods against the oldest two
+            recent_avg = gross_margins[:2].mean()
+            older_avg = gross_margins[-2:].mean()
             
             if recent_avg > older_avg + 0.02:  # 2%+ improvement
                 score += 3
@@ -52,8 +46,8 @@ class PricingPowerAnalysis():
                 reasoning.append("Declining gross margins may indicate pricing pressure")
         
         # Check if company has been able to maintain high margins consistently
-        if gross_margins:
-            avg_margin = sum(gross_margins) / len(gross_margins)
+        if len(gross_margins) > 0:
+            avg_margin = float(gross_margins.mean())
             if avg_margin > 0.5:  # 50%+ gross margins
                 score += 2
                 reasoning.append(f"Consistently high gross margins ({avg_margin:.1%}) indicate strong pricing power")
@@ -65,29 +59,6 @@ class PricingPowerAnalysis():
         result["details"] = reasoning if reasoning else ["Limited pricing power analysis available"]
         return result
 
-    def get_markdown(self, analysis:dict):
-        """
-        Convert analysis to markdown.
-        """
-        markdown_content = markdown.analysis_data(analysis)
-        return markdown_content
-
-    def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
-        context = state.get('context')
-        analysis_data = context.get('analysis_data')
-        if analysis_data is None:
-            analysis_data = {}
-            context['analysis_data'] = analysis_data
-        metrics = context.get('metrics')
-        analysis = self.analyze(metrics)
-        analysis['type'] = 'pricing_power_analysis'
-        analysis['title'] = 'Pricing power analysis'
-
-        analysis_data['pricing_power_analysis'] = analysis
-        ai_message = AIMessage(content=self.get_markdown(analysis))
-        return {
-            "context": context,
-            "messages": [
-                ai_message
-            ]
-        }
\ No newline at end of file
+    def analyze_context(self, context: dict, metric_columns: dict = None) -> dict[str, any]:
+        """Analyze context['metrics'] and its metric columns."""
+        return self.analyze(context.get('metrics'), get_metric_column(context, 'metrics', 'gross_margin', metric_columns))
@@ -1,13 +1,10 @@
 from langgraph.graph import MessagesState
-from dataclasses import dataclass
 from typing import Optional, TypedDict
 
-@dataclass
 class StateAction(TypedDict):
     type: str | int
     parameters: dict
 
-@dataclass
 class StateContext(TypedDict):
     analysis_data: dict[str, any]
     metrics: list[dict[str, any]]
@@ -16,7 +13,6 @@ class StateContext(TypedDict):
     task_index: int
 
 
-@dataclass
 class StateTicker(TypedDict):
     symbol: str
     exchange: str
@@ -30,7 +26,6 @@ class StateTicker(TypedDict):
     short_name: str
     time: str
 
-@dataclass
 class AgentState(MessagesState):
     locale: str = "en-US"
     tickers: Optional[list[StateTicker]] = None
@@ -1,15 +1,75 @@
+import logging
+import threading
 import requests
-import time
+from concurrent.futures import Future
+from functools import lru_cache
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 from urllib.parse import urlencode
 from common.settings import Settings
+from common.ttl_cache import TTLCache
 from langchain_core.runnables import RunnableConfig
 
+logger = logging.getLogger(__name__)
+
+# seconds an identical request is served from memory, by endpoint. Fundamentals only change when the dataset refreshes,
+# prices, quotes and news move during the day. Endpoints not listed here always go to the remote dataset.
+_ENDPOINT_CACHE_TTLS = {
+    'ticker/financial_metrics': 15 * 60,
+    'ticker/financial_items': 15 * 60,
+    'ticker/insider_transactions': 15 * 60,
+    'ticker/insider_roster_holders': 15 * 60,
+    'ticker/lookup': 5 * 60,
+    'ticker/info': 60,
+    'ticker/prices': 60,
+    'ticker/news': 30,
+}
+_response_caches = {endpoint: TTLCache(maxsize=256, ttl=ttl) for endpoint, ttl in _ENDPOINT_CACHE_TTLS.items()}
+# fundamentals only change when the dataset refreshes, so during an outage of the remote dataset their last successful
+# response is still a fair answer. Prices, quotes and news go stale within minutes and fail instead.
+_STALE_FALLBACK_ENDPOINTS = frozenset({'ticker/financial_metrics', 'ticker/financial_items'})
+# last successful response of every fundamentals request, kept for a day past its TTL
+_last_known_good = TTLCache(maxsize=1024, ttl=24 * 60 * 60)
+# requests currently being fetched, by cache key
+_inflight: dict[tuple, Future] = {}
+_inflight_lock = threading.Lock()
+
+# transient failures (connection errors, timeouts, 429 and 5xx) are retried with a short jittered exponential backoff,
+# other errors are answered at once and reported by _fetch
+_retry = Retry(
+    total=3, backoff_factor=0.25, backoff_jitter=0.25, backoff_max=2,
+    status_forcelist=(429, 500, 502, 503, 504), allowed_methods=('GET',), respect_retry_after_header=True
+)
+# seconds to connect and to wait for the response
+_timeout = (5, 60)
+# what the session raises once the retries are used up: no connection, no answer in time, or still 429/5xx
+_TRANSPORT_ERRORS = (requests.ConnectionError, requests.Timeout, requests.exceptions.RetryError)
+
+# one pooled session for every Dataset, so requests reuse keep-alive connections instead of a new TCP/TLS handshake each
+_session = requests.Session()
+_session.mount('https://', HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=_retry))
+_session.mount('http://', HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=_retry))
+
+
+@lru_cache(maxsize=1024)
+def _format_url(base_url: str, path: str, query: tuple) -> str:
+    # format url, trim leading '/'
+    url = f'{base_url}/api/v1/{path.lstrip("/")}'
+    # format query string in url, and encode special characters
+    if query:
+        url += f'?{urlencode(query)}'
+    return url
+
 
 class Dataset:
     def __init__(self, config: RunnableConfig):
         self.settings = Settings(config)
         self.remote_dataset_url = self.settings.get_remote_financial_data_api_url().rstrip("/")
         self.remote_dataset_token = self.settings.get_remote_financial_data_api_key()
+        # the token differs between configs, so it goes on each request rather than on the shared session
+        self.headers = {
+            'Authorization': f'Bearer {self.remote_dataset_token}'
+        }
     
     def get_financial_metrics(self, symbol, end_date=None, period='quarterly'):
         data = self._request(f'ticker/financial_metrics', query={'symbol': symbol, 'freq': period})
@@ -20,7 +80,8 @@ class Dataset:
     
     def get_financial_items(self, symbol, items: list[str], end_date=None, period='quarterly'):
         if items is not None and len(items) > 0:
-            items = ','.join(items)
+            # sorted, so the same field set in any order is the same url and cache key
+            items = ','.join(sorted(items))
         else:
             items = None
         data = self._request(f'ticker/financial_items', query={'symbol': symbol, 'items':items, 'freq': period})
@@ -58,25 +119,58 @@ class Dataset:
     def lookup_ticker(self, query: str) -> dict:
         return self._request(f'ticker/lookup', query={'query': query})
     
-    def _request(self, url: str, query: dict = None, max_retries: int = 3) -> requests.Response:
-        # format url, trim leading '/'
-        url = f'{self.remote_dataset_url}/api/v1/{url.lstrip("/")}'
-        # format query string in url, and encode special characters
-        if query:
-            url += f'?{urlencode(query)}'
+    def _request(self, url: str, query: dict = None) -> requests.Response:
+        endpoint = url.lstrip('/')
+        cache = _response_caches.get(endpoint)
+        # parameters in a fixed order, so the same query always gives the same url and cache key
+        url = _format_url(self.remote_dataset_url, url, tuple(sorted(query.items())) if query else ())
         
-        headers = {
-            'Authorization': f'Bearer {self.remote_dataset_token}'
-        }
+        # the key includes the token so different dataset accounts never share entries
+        cache_key = (url, self.remote_dataset_token)
+        data = cache.get(cache_key) if cache is not None else None
+        if data is None:
+            data = self._load(url, cache, cache_key, endpoint in _STALE_FALLBACK_ENDPOINTS)
+        # the cached rows themselves are returned, callers treat them as read-only and copy before changing them
+        return data
+    
+    def _load(self, url: str, cache: TTLCache | None, cache_key: tuple, stale_fallback: bool = False):
+        # concurrent callers of the same request wait for the one already in flight instead of sending their own
+        with _inflight_lock:
+            pending = _inflight.get(cache_key)
+            if pending is None:
+                _inflight[cache_key] = Future()
+        if pending is not None:
+            return pending.result()
         
-        for attempt in range(max_retries + 1):  # +1 for initial attempt
-            response = requests.get(url, headers=headers)
-            if response.status_code != 200 and attempt < max_retries:
-                delay = 10 + (5 * attempt)
-                print(f"Request Failed. Attempt {attempt + 1}/{max_retries + 1}. Waiting {delay}s before retrying...")
-                time.sleep(delay)
-                continue
-            result = response.json()
-            if result['code'] != 0:
-                raise Exception(f'Failed to get data from remote dataset. Url: {url}, Error: {result["code"]}, Msg: {result["msg"]}')
-            return result['data']
\ No newline at end of file
+        future = _inflight[cache_key]
+        try:
+            try:
+                data = self._fetch(url)
+            except _TRANSPORT_ERRORS as e:
+                # only failures left over after the retries, an answer the dataset did give (an error code or a page
+                # that is not JSON) is raised as is
+                data = _last_known_good.get(cache_key) if stale_fallback else None
+                if data is None:
+                    raise
+                logger.warning("Request failed after retries (%s), using the last successful response for %s", e, url)
+            else:
+                if cache is not None:
+                    cache.set(cache_key, data)
+                if stale_fallback:
+                    _last_known_good.set(cache_key, data)
+            future.set_result(data)
+            return data
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with _inflight_lock:
+                del _inflight[cache_key]
+    
+    def _fetch(self, url: str):
+        # retries happen inside the session adapter
+        response = _session.get(url, headers=self.headers, timeout=_timeout)
+        result = response.json()
+        if result['code'] != 0:
+            raise Exception(f'Failed to get data from remote dataset. Url: {url}, Error: {result["code"]}, Msg: {result["msg"]}')
+        return result['data']
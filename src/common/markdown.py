@@ -1,5 +1,10 @@
 import json
 import uuid
+from functools import lru_cache
+
+# keys of analysis dicts that only identify the markdown block and are never rendered
+_SKIP_KEYS = frozenset({'_id_'})
+_KV_TABLE_HEADER = '| Key | Value |\n| --- | --- |\n'
 
 
 def ticker_select(data:dict):
@@ -20,13 +25,12 @@ def from_dict(data:dict):
     """
     Convert a dict to a markdown string.
     """
-    markdown = ''
+    parts = []
     for key, value in data.items():
-        if key == '_id_':
+        if key in _SKIP_KEYS:
             continue
-        markdown += f'## {key}\n\n'
-        markdown += f'{value}\n\n'
-    return markdown
+        parts.append(f'## {key}\n\n{value}\n\n')
+    return ''.join(parts)
 
 
 
@@ -34,44 +38,41 @@ def dict_to_table(data:dict, keys:list | None = None):
     """
     Convert a dict to a markdown table.
     """
-    markdown = ''
     # add key and value header
-    markdown += '| Key | Value |\n'
-    markdown += '| --- | --- |\n'
+    parts = [_KV_TABLE_HEADER]
     for key, value in data.items():
-        if key == '_id_':
+        if key in _SKIP_KEYS:
             continue
         if keys is not None and key not in keys:
             continue
-        markdown += f'| {key} | {value} |\n'
-    return markdown
+        parts.append(f'| {key} | {value} |\n')
+    return ''.join(parts)
+
+@lru_cache(maxsize=128)
+def _table_header(keys: tuple) -> str:
+    # 第一行是header, 第二行是分隔线
+    return '| ' + ' | '.join(keys) + ' |\n' + '| ' + ' | '.join(['---'] * len(keys)) + ' |\n'
 
 def list_dict_to_table(data:list, keys:list | None = None):
     """
     Convert a list of dict to a markdown table, header is the keys of the dict.
     """
-    markdown = ''
-
     # 第一行是header
     if keys is None:
         keys = data[0].keys()
-    markdown += '| ' + ' | '.join(keys) + ' |\n'
-    # 第二行是分隔线
-    markdown += '| ' + ' | '.join(['---' for _ in keys]) + ' |\n'
+    keys = tuple(keys)
+    parts = [_table_header(keys)]
     # 第三行开始是数据
     for item in data:
-        markdown += '| ' + ' | '.join([str(item.get(key, '')) for key in keys]) + ' |\n'
-    return markdown
+        parts.append('| ' + ' | '.join([str(item.get(key, '')) for key in keys]) + ' |\n')
+    return ''.join(parts)
 
 
 def list_str_to_sequence(data:list):
     """
     Convert a list of string to a markdown sequence.
     """
-    markdown = ''
-    for item in data:
-        markdown += f'1. {item}\n'
-    return markdown
+    return ''.join([f'1. {item}\n' for item in data])
 
 
 def to_h1(data:str):
@@ -0,0 +1,31 @@
+import numpy as np
+
+
+def to_metric_column(rows: list, field: str) -> np.ndarray:
+    """
+    Extract one field of a list of metric dicts into a float64 array, NaN where the value is missing.
+    NaN compares False against any threshold, so filters such as column[column > 0] drop missing values.
+    """
+    rows = rows or []
+    return np.fromiter(
+        (np.nan if (value := row.get(field)) is None else value for row in rows),
+        dtype=np.float64, count=len(rows)
+    )
+
+
+def to_metric_columns(rows: list, fields: list[str]) -> dict[str, np.ndarray]:
+    """
+    Extract several fields of a list of metric dicts into float64 columns in a single pass over the rows.
+    Missing values become NaN, exactly as in to_metric_column.
+    """
+    table = np.array([[row.get(field) for field in fields] for row in rows or []], dtype=np.float64)
+    return dict(zip(fields, table.reshape(-1, len(fields)).T.copy()))
+
+
+def get_metric_column(context: dict, key: str, field: str, metric_columns: dict = None) -> np.ndarray:
+    """
+    The field column of the metric rows in context[key]. Taken from metric_columns[key] when the caller already built
+    it with to_metric_columns, otherwise extracted from the rows. Nothing is stored in the context.
+    """
+    column = (metric_columns or {}).get(key, {}).get(field)
+    return column if column is not None else to_metric_column(context.get(key), field)
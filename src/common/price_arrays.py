@@ -0,0 +1,35 @@
+from operator import itemgetter
+import numpy as np
+
+_get_close_high_low = itemgetter('close', 'high', 'low')
+
+
+def clean_prices(prices: list) -> list[dict]:
+    """
+    Keep only the price rows with a close, high and low, so consumers can subscript them directly.
+    """
+    return [
+        price for price in prices or []
+        if price.get('close') and price.get('high') is not None and price.get('low') is not None
+    ]
+
+
+def to_price_arrays(prices: list) -> dict[str, np.ndarray]:
+    """
+    Convert a list of price dicts (as returned by clean_prices) into column arrays in a single pass.
+    returns[i] is the percentage change from closes[i] to closes[i+1], 0 when the previous close is not positive.
+    """
+    rows = np.asarray(list(map(_get_close_high_low, prices or [])), dtype=np.float64).reshape(-1, 3)
+    closes, highs, lows = rows.T.copy()
+
+    prev_closes = closes[:-1]
+    returns = np.zeros(max(len(closes) - 1, 0), dtype=np.float64)
+    valid = prev_closes > 0
+    returns[valid] = (closes[1:][valid] - prev_closes[valid]) / prev_closes[valid] * 100
+    return {
+        'closes': closes,
+        'highs': highs,
+        'lows': lows,
+        'returns': returns,
+    }
+
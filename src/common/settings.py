@@ -1,6 +1,17 @@
 import base64
 from langchain_core.runnables import RunnableConfig
 import json
+from functools import lru_cache
+
+
+@lru_cache(maxsize=128)
+def _parse_settings(settings: str) -> dict:
+    """
+    Decode the base64 JSON x-settings value. A turn builds several Settings from the same config,
+    so each distinct value is decoded once and the parsed dict is shared, it must be treated as read-only.
+    No caller changes it (the router gets its model list through a JSON round trip), copy it before changing anything.
+    """
+    return json.loads(base64.b64decode(settings).decode('utf-8'))
 
 
 class Settings():
@@ -13,9 +24,7 @@ class Settings():
         settings = config.get("configurable", {}).get("x-settings", "")
         if settings == "":
             return None
-        # base64 decode
-        settings = base64.b64decode(settings).decode('utf-8')
-        return json.loads(settings)
+        return _parse_settings(settings)
 
     def get_intent_recognition_model(self) -> dict:
         return self.dict.get("intentRecognitionModel", {})
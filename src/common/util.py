@@ -4,6 +4,12 @@ import re
 import base64
 from langchain_core.runnables import RunnableConfig
 
+# helpers below run on every streamed LLM chunk, so the pattern and the translation table are built once
+_AT_ITEM_PATTERN = re.compile(r'@(\w+)')
+# removes \ and \n in one pass
+_JSON_FIX_TABLE = str.maketrans({'\\': '', '\n': ''})
+_MISSING = object()
+
 
 def dict_to_obj(dictionary):
     if isinstance(dictionary, dict):
@@ -25,7 +31,7 @@ def get_dict_json(s: str) -> dict:
         else:
             r = s[0:end]
         # remove \ and \n from string
-        r = r.replace('\\', '').replace('\n', '')
+        r = r.translate(_JSON_FIX_TABLE)
         return json.loads(r)
     except Exception as e:
         print('get_json error:', s, e)
@@ -35,7 +41,7 @@ def get_at_items(content: str):
     """
     从字符串content中解析出所有的 @[item_name] 的内容， item_name 是动态的字符内容，返回一个列表
     """
-    items = re.findall(r'@(\w+)', content)
+    items = _AT_ITEM_PATTERN.findall(content)
     return items
 
 def get_array_json(s: str) -> list:
@@ -50,7 +56,7 @@ def get_array_json(s: str) -> list:
         else:
             r = s[0:end]
         # remove \ and \n from string
-        r = r.replace('\\', '').replace('\n', '')
+        r = r.translate(_JSON_FIX_TABLE)
         return json.loads(r)
     except Exception as e:
         print('get_json error:', s, e)
@@ -59,18 +65,20 @@ def get_array_json(s: str) -> list:
 
 
 def get_latest_message_content(state):
-    if state.get("messages") is None or len(state["messages"]) == 0:
+    messages = state.get("messages")
+    if not messages:
         return ""
-    last_message = state["messages"][-1]
     # Ensure content is a string even if it's stored as a list
-    content = last_message.content
-    if isinstance(content, list) and len(content) > 0:
+    content = messages[-1].content
+    if isinstance(content, list) and content:
         lastMessage = content[-1]
         if isinstance(lastMessage, dict):
-            content = lastMessage.get('content', lastMessage.get('text', ''))
-        elif hasattr(lastMessage, 'content'):
-            content = lastMessage.content
-        elif hasattr(lastMessage, 'text'):
-            content = lastMessage.text
+            content = lastMessage['content'] if 'content' in lastMessage else lastMessage.get('text', '')
+        else:
+            # one attribute lookup per name instead of hasattr followed by the access
+            value = getattr(lastMessage, 'content', _MISSING)
+            if value is _MISSING:
+                value = getattr(lastMessage, 'text', _MISSING)
+            if value is not _MISSING:
+                content = value
     return content
-
@@ -1,8 +1,16 @@
+import hashlib
+import json
+import re
+from functools import lru_cache
 from langchain.schema import AIMessage
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
 from langchain_litellm import ChatLiteLLMRouter
 from litellm import Router
 from langchain_core.runnables import RunnableConfig
 from common.settings import Settings
+from common.ttl_cache import TTLCache
 from mcp import ClientSession
 from mcp.client.streamable_http import streamablehttp_client
 
@@ -21,15 +29,26 @@ async def get_tools(server_params) -> list[BaseTool]:
             tools = await load_mcp_tools(session)
             return tools
 
+@lru_cache(maxsize=16)
+def _get_router(model_list: str) -> Router:
+    """
+    One litellm router per model configuration, reused across calls so it keeps its provider
+    clients and their pooled connections alive between requests.
+    model_list is the JSON-serialized settings model list, which makes it hashable.
+    """
+    return Router(model_list=json.loads(model_list))
+
+@lru_cache(maxsize=32)
+def _get_chat_model(model_list: str, model_name: str) -> ChatLiteLLMRouter:
+    return ChatLiteLLMRouter(router=_get_router(model_list), model_name=model_name)
+
 def get_llm(settings: Settings)->ChatLiteLLMRouter:
-    litellm_router = Router(model_list=settings.get_model_list())
-    llm = ChatLiteLLMRouter(router=litellm_router, model_name=settings.get_intent_recognition_model().get("model", ""))
-    return llm
+    model_list = json.dumps(settings.get_model_list(), sort_keys=True)
+    return _get_chat_model(model_list, settings.get_intent_recognition_model().get("model", ""))
 
 def get_analyzer(settings: Settings)->ChatLiteLLMRouter:
-    litellm_router = Router(model_list=settings.get_model_list())
-    llm = ChatLiteLLMRouter(router=litellm_router, model_name=settings.get_analysis_model().get("model", ""))
-    return llm
+    model_list = json.dumps(settings.get_model_list(), sort_keys=True)
+    return _get_chat_model(model_list, settings.get_analysis_model().get("model", ""))
 
 
 async def ainvoke(messages, config: RunnableConfig,  stream=True, analyzer=False):
@@ -49,6 +68,57 @@ async def ainvoke(messages, config: RunnableConfig,  stream=True, analyzer=False
         return await get_analyzer(settings).ainvoke(messages, config, stream=stream)
     return await get_llm(settings).ainvoke(messages, config, stream=stream)
 
+# completed responses of ainvoke_cached, keyed by model configuration and prompt, so a resubmitted analysis does not pay for the same completion twice
+_response_cache = TTLCache(maxsize=128, ttl=60 * 60)
+# whitespace runs stay attached to the token before them when a cached response is replayed
+_REPLAY_TOKEN_PATTERN = re.compile(r'\S+\s*|\s+')
+
+
+class _ReplayChatModel(BaseChatModel):
+    """
+    Chat model that answers with a stored response. It streams the response in word-sized chunks through the
+    regular callbacks, so a cache hit reaches the messages stream the same way a live completion does.
+    """
+    response: AIMessage
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=self.response.model_copy(update={"id": None}))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        content = self.response.content if isinstance(self.response.content, str) else str(self.response.content)
+        for token in _REPLAY_TOKEN_PATTERN.findall(content):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", response_metadata=self.response.response_metadata))
+
+
+async def ainvoke_cached(messages, config: RunnableConfig, stream=True, analyzer=False):
+    """
+    ainvoke for deterministic prompts built from analysis data: an identical prompt sent with the same settings
+    within the cache ttl gets the earlier response back instead of a new completion, replayed through the same
+    streaming callbacks as a live one.
+    messages must be JSON serializable, e.g. (role, content) tuples. The key covers the whole settings (model list,
+    provider parameters and any user preferences), the selected model and the prompt text, so neither another
+    configuration nor an edited prompt is ever served a response produced for a different one.
+    """
+    settings = Settings(config)
+    cache_key = hashlib.sha256(
+        json.dumps([settings.dict, analyzer, messages], sort_keys=True, default=str).encode()
+    ).hexdigest()
+    response = _response_cache.get(cache_key)
+    if response is None:
+        response = await ainvoke(messages, config, stream=stream, analyzer=analyzer)
+        _response_cache.set(cache_key, response)
+        # a fresh id, otherwise add_messages would replace the earlier message with the same id instead of appending
+        return response.model_copy(update={"id": None})
+    return await _ReplayChatModel(response=response).ainvoke(messages, config, stream=stream)
+
 
 async def ainvoke_with_tools(messages, config: RunnableConfig, tools: list[BaseTool], stream=True, analyzer=False):
     settings = Settings(config)
@@ -63,8 +133,10 @@ async def ainvoke_with_tools(messages, config: RunnableConfig, tools: list[BaseT
 
 
 async def ainvoke2(messages, config: RunnableConfig, response_metadata = None):
-    full_content = ""
+    content_parts = []
     message_id = None
+    # run whose content is streamed, only its final message contributes response metadata
+    run_id = None
     final_response_metadata = {}
     if response_metadata is None:
         response_metadata = {}
@@ -74,14 +146,15 @@ async def ainvoke2(messages, config: RunnableConfig, response_metadata = None):
         if event["event"] == "on_chat_model_stream":
             chunk = event["data"]["chunk"]
             if chunk.content:
-                full_content += chunk.content
+                content_parts.append(chunk.content)
                 if message_id is None:
                     message_id = chunk.id
+                    run_id = event["run_id"]
                     # 只在第一次 chunk 中更新 response_metadata， chunk的操作是追加， 第一次更新后， 后续前端都会有这个值
                     chunk.response_metadata.update(response_metadata)
-                else:
-                    final_response_metadata.update(chunk.response_metadata)
-
+        elif event["event"] == "on_chat_model_end" and event["run_id"] == run_id:
+            # the final message already carries the metadata merged from every chunk, take it once instead of per chunk
+            final_response_metadata.update(event["data"]["output"].response_metadata)
 
-    return AIMessage(content=full_content, id=message_id, response_metadata=final_response_metadata)
 
+    return AIMessage(content=''.join(content_parts), id=message_id, response_metadata=final_response_metadata)
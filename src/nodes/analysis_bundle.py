@@ -0,0 +1,45 @@
+from common.agent_state import AgentState
+from langchain.schema import AIMessage
+from langchain_core.runnables import RunnableConfig
+from typing import Dict, Any
+from common.metric_columns import to_metric_columns
+from langgraph.types import StreamWriter
+import asyncio
+
+
+class AnalysisBundle():
+    """
+    Runs independent analyzers in one node. Analyzers that only read the context prepared by start_analysis
+    are gathered concurrently instead of being chained through the graph one hop at a time.
+    options['analyzers'] is the list of analyzers, each providing run(context, metric_columns) and get_markdown(analysis).
+    options['metric_fields'] maps a context key holding metric rows to the fields the analyzers read from it. Their
+    float64 columns are built once per call and passed to every analyzer, they never enter the graph state.
+    The analyzers are module-level singletons shared by every run of the compiled graph, so run() must keep all
+    per-run data in the context it is given and never store it on the analyzer.
+    """
+    def __init__(self, options: Dict[str, Any]):
+        self.options = options
+        self.analyzers = options['analyzers']
+        self.metric_fields = options.get('metric_fields', {})
+
+    async def __call__(self, state: AgentState, config: RunnableConfig, writer: StreamWriter) -> Dict[str, Any]:
+        context = state.get('context')
+        analysis_data = context.get('analysis_data')
+        if analysis_data is None:
+            analysis_data = {}
+            context['analysis_data'] = analysis_data
+        metric_columns = {key: to_metric_columns(context.get(key), fields) for key, fields in self.metric_fields.items()}
+        # analyze off the event loop, the workers only read the context and the columns
+        analyses = await asyncio.gather(*(
+            asyncio.to_thread(analyzer.run, context, metric_columns) for analyzer in self.analyzers
+        ))
+
+        # state updates and messages stay on the event loop, in analyzer order
+        messages = []
+        for analyzer, analysis in zip(self.analyzers, analyses):
+            analysis_data[analysis['type']] = analysis
+            messages.append(AIMessage(content=analyzer.get_markdown(analysis)))
+        return {
+            "context": context,
+            "messages": messages
+        }
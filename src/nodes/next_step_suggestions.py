@@ -5,21 +5,16 @@ from llm.llm_model import ainvoke
 from common.util import get_array_json
 from langchain_core.messages import AIMessage, SystemMessage
 from common import markdown
+from common.settings import Settings
+from common.ttl_cache import TTLCache
+import hashlib
+import json
 
+# suggestions by user, model and the latest exchange, a conversation that ends the same way gets the same suggestions
+# within the hour without another completion
+_suggestions_cache = TTLCache(maxsize=256, ttl=60 * 60)
 
-
-class NextStepSuggestions():
-    def __init__(self, options: Dict[str, Any]):
-        self.options = options
-
-    async def __call__(self, state: AgentState, config: RunnableConfig) -> Dict[str, Any]:
-        action = state.get("action")
-        suggestions = []
-        if action is not None and action.get("parameters") is not None and action.get("parameters").get("suggestions") is not None:
-            suggestions = action.get("parameters").get("suggestions")
-        else:
-            messages = state["messages"]
-            prompt = f"""Based on current conversation, predict user intent and generate 2 intelligent question suggestions:
+_SUGGESTIONS_PROMPT = SystemMessage(content="""Based on current conversation, predict user intent and generate 2 intelligent question suggestions:
     1. Questions should be specific and valuable
     2. Avoid overly broad or repetitive queries
     3. Consider users' actual scenario needs
@@ -27,12 +22,34 @@ class NextStepSuggestions():
 
     Please output in the following JSON format:
     [ "Question 1","Question 2"]
-    """
-            messages = state["messages"] + [SystemMessage(content=prompt)]
+    """)
+
 
-            # not show in ui and not save in db
-            output = await ainvoke(messages, config, stream=False)
-            suggestions = get_array_json(output.content)
+class NextStepSuggestions():
+    def __init__(self, options: Dict[str, Any]):
+        self.options = options
+
+    def get_cache_key(self, messages: list, config: RunnableConfig) -> str:
+        model = Settings(config).get_intent_recognition_model().get("model", "")
+        user_id = config.get("configurable", {}).get("user_id")
+        recent = [message.content for message in messages[-2:]]
+        return hashlib.sha256(json.dumps([user_id, model, recent], default=str).encode()).hexdigest()
+
+    async def __call__(self, state: AgentState, config: RunnableConfig) -> Dict[str, Any]:
+        action = state.get("action")
+        parameters = action.get("parameters") if action is not None else None
+        suggestions = parameters.get("suggestions") if parameters is not None else None
+        if suggestions is None:
+            messages = state["messages"]
+            cache_key = self.get_cache_key(messages, config)
+            suggestions = _suggestions_cache.get(cache_key)
+            if suggestions is None:
+                # not show in ui and not save in db
+                output = await ainvoke(messages + [_SUGGESTIONS_PROMPT], config, stream=False)
+                suggestions = get_array_json(output.content)
+                if suggestions:
+                    _suggestions_cache.set(cache_key, suggestions)
+            suggestions = list(suggestions)
         content = f"""## 🔍 Next Steps Suggestions
 {markdown.list_str_to_sequence(suggestions)}
 """
@@ -1,3 +1,4 @@
+import asyncio
 from typing import Any, Dict, Generic, TypeVar
 from langchain.schema import AIMessage
 from langchain_core.runnables import RunnableConfig
@@ -22,19 +23,28 @@ class TickerSearch(Generic[T]):
     def __init__(self, options: Dict[str, Any]):
         self.options = options
 
+    def get_query(self, ticker: dict) -> str:
+        query = ticker.get('symbol', '')
+        if query == '':
+            query = ticker.get('en_name', '')
+        if query == '':
+            query = ticker.get('short_name', '')
+        return query
+
+    def lookup(self, query: str, dataset: Dataset | None) -> list:
+        if query == '':
+            return []
+        return dataset.lookup_ticker(query)
+
     async def __call__(self, state: AgentState, writer: StreamWriter, config: RunnableConfig) -> T:
         tickers = state.get('action').get('parameters').get('tickers')
+        queries = [self.get_query(ticker) for ticker in tickers]
+        # one client for every lookup, and none at all when there is nothing to look up
+        dataset = Dataset(config) if any(queries) else None
+        # the lookups are independent blocking requests, run them in worker threads together instead of one round-trip at a time
+        lookup_results = await asyncio.gather(*(asyncio.to_thread(self.lookup, query, dataset) for query in queries))
         json_markdown = ''
-        for ticker in tickers:
-            query = ticker.get('symbol', '')
-            if query == '':
-                query = ticker.get('en_name', '')
-            if query == '':
-                query = ticker.get('short_name', '')
-            lookup_result = []
-            if query != '':
-                dataset = Dataset(config)
-                lookup_result = dataset.lookup_ticker(query)
+        for query, lookup_result in zip(queries, lookup_results):
             if len(lookup_result) == 0:
                 json_markdown += f'* {query} not found\n'
             else: